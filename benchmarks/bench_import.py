@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+
+"""
+    Import time guard for the core client.
+
+    Times 'from pyameritrade.client import Client' in a fresh interpreter
+    and fails if any of the heavy optional modules came along with it.
+
+        python benchmarks/bench_import.py [runs]
+"""
+
+import os
+import sys
+import subprocess
+
+
+# only needed for candles (pandas/numpy) and the charts package (plotly)
+HEAVY_MODULES = ('pandas', 'numpy', 'plotly')
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+from pyameritrade.client import Client
+elapsed = time.perf_counter() - start
+heavy = [m for m in %r if m in sys.modules]
+print('%%f %%s' %% (elapsed, ','.join(heavy)))
+""" % (HEAVY_MODULES,)
+
+
+def probe():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    output = subprocess.check_output([sys.executable, '-c', PROBE], env=env).decode().split()
+    return float(output[0]), output[1].split(',') if len(output) > 1 else []
+
+
+if __name__ == '__main__':
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    results = [probe() for _ in range(runs)]
+    best = min(elapsed for elapsed, _ in results)
+    heavy = results[0][1]
+
+    print("import pyameritrade.client: %.1f ms (best of %d)" % (best * 1000, runs))
+    if heavy:
+        print("FAIL: heavy modules imported: %s" % ', '.join(heavy))
+        sys.exit(1)
+    print("ok: none of %s imported" % ', '.join(HEAVY_MODULES))
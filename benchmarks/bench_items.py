@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+"""
+    Memory and construction time of Quote items.
+
+    Compares the old eager setattr-per-key item against the lazy,
+    slot-backed AmeritradeItem on a batch of ~50 field quotes.
+
+        python -m benchmarks.bench_items [quotes]
+"""
+
+import sys
+import time
+import tracemalloc
+
+from pyameritrade.items import Quote
+
+
+QUOTE_FIELDS = ('assetType', 'assetMainType', 'cusip', 'symbol', 'description', 'bidPrice', 'bidSize',
+                'bidId', 'askPrice', 'askSize', 'askId', 'lastPrice', 'lastSize', 'lastId', 'openPrice',
+                'highPrice', 'lowPrice', 'bidTick', 'closePrice', 'netChange', 'totalVolume',
+                'quoteTimeInLong', 'tradeTimeInLong', 'mark', 'exchange', 'exchangeName', 'marginable',
+                'shortable', 'volatility', 'digits', '52WkHigh', '52WkLow', 'nAV', 'peRatio', 'divAmount',
+                'divYield', 'divDate', 'securityStatus', 'regularMarketLastPrice', 'regularMarketLastSize',
+                'regularMarketNetChange', 'regularMarketTradeTimeInLong', 'netPercentChangeInDouble',
+                'markChangeInDouble', 'markPercentChangeInDouble', 'regularMarketPercentChangeInDouble',
+                'delayed', 'realtimeEntitled', 'exchangeCode', 'lastTradeDate')
+
+
+def make_quotes(count):
+    data = dict()
+    for i in range(count):
+        symbol = 'S%05d' % i
+        quote = dict((field, float(n + i)) for n, field in enumerate(QUOTE_FIELDS))
+        quote['symbol'] = symbol
+        data[symbol] = quote
+    return data
+
+
+class LegacyQuote():
+    def __init__(self, symbol, json, client):
+        self.json = json
+        self.client = client
+        for k, v in self.json.items():
+            if isinstance(k, str) and k[0].isdigit():
+                k = '_'+k
+            setattr(self, k, v)
+
+
+def measure(klass, data):
+    tracemalloc.start()
+    start = time.perf_counter()
+    items = [klass(symbol, quote_json, None) for symbol, quote_json in data.items()]
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert items[0]._52WkHigh == items[0].json['52WkHigh']
+    return elapsed, size
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    data = make_quotes(count)
+
+    for name, klass in (('eager', LegacyQuote), ('lazy', Quote)):
+        elapsed, size = measure(klass, data)
+        print("%-6s %8.2f ms  %8.1f bytes/quote  (%d quotes)" % (name, elapsed * 1000, size / count, count))
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+"""
+    Per-candle cost of building PriceHistory.candles.
+
+    Compares the old row-by-row iterrows() construction against the
+    columnar candle_frame() decoder.
+
+        python -m benchmarks.bench_price_history [candles]
+"""
+
+import sys
+import time
+from datetime import datetime
+
+import pandas
+
+from pyameritrade.items import candle_frame
+
+
+def make_candles(count, start_ms=1262304000000, step_ms=60000):
+    candles = list()
+    for i in range(count):
+        price = 100.0 + (i % 500) * 0.01
+        candles.append({'open': price,
+                        'high': price + 0.05,
+                        'low': price - 0.05,
+                        'close': price + 0.01,
+                        'volume': 1000 + i % 97,
+                        'datetime': start_ms + i * step_ms})
+    return candles
+
+
+def legacy_frame(candles):
+    frame = pandas.DataFrame(candles)
+    # newer pandas refuses to upcast the int64 column in place
+    frame['datetime'] = frame['datetime'].astype(object)
+    for i, candle in frame.iterrows():
+        frame.at[i, 'datetime'] = datetime.utcfromtimestamp(candle['datetime']/1000.0)
+    return frame
+
+
+def timeit(func, candles, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(candles)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    candles = make_candles(count)
+
+    legacy = timeit(legacy_frame, candles, 1)
+    columnar = timeit(candle_frame, candles, 5)
+
+    print("candles:   %d" % count)
+    print("iterrows:  %10.3f us/candle" % (legacy / count * 1e6))
+    print("columnar:  %10.3f us/candle" % (columnar / count * 1e6))
+    print("speedup:   %10.1fx" % (legacy / columnar))
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+"""
+    Diff two benchmark result files.
+
+        python -m benchmarks.compare benchmarks/results/OLD.json benchmarks/results/NEW.json
+
+    Exits non-zero if any scenario's mean got slower by more than --threshold.
+"""
+
+import sys
+import json
+import argparse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=10.0, help='percent slowdown counted as a regression')
+    args = parser.parse_args(argv)
+
+    with open(args.old) as fo:
+        old = json.load(fo)
+    with open(args.new) as fo:
+        new = json.load(fo)
+
+    print("%-28s %12s %12s %9s" % ('%s -> %s' % (old['commit'], new['commit']), 'old ms', 'new ms', 'change'))
+
+    regressions = 0
+    for name in sorted(set(old['results']) | set(new['results'])):
+        before, after = old['results'].get(name), new['results'].get(name)
+        if not before or not after:
+            print("%-28s %12s %12s" % (name, before and '%.3f' % before['mean_ms'] or '-',
+                                       after and '%.3f' % after['mean_ms'] or '-'))
+            continue
+
+        change = (after['mean_ms'] / before['mean_ms'] - 1) * 100
+        flag = ''
+        if change > args.threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print("%-28s %12.3f %12.3f %+8.1f%%%s" % (name, before['mean_ms'], after['mean_ms'], change, flag))
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
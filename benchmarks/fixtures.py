@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+"""
+    Deterministic stand-ins for recorded TD Ameritrade payloads.
+"""
+
+import random
+
+from benchmarks.bench_items import QUOTE_FIELDS
+
+
+SEED = 1234
+DAY_MS = 24 * 60 * 60 * 1000
+START_MS = 946684800000 # 2000-01-01
+
+
+def quote(symbol):
+    rng = random.Random(symbol)
+    price = rng.uniform(5, 500)
+    data = dict((field, round(price * rng.uniform(0.9, 1.1), 2)) for field in QUOTE_FIELDS)
+    data.update(symbol=symbol, assetType='EQUITY', description='%s Corp' % symbol,
+                exchangeName='NASD', lastPrice=round(price, 2))
+    return data
+
+
+def quotes(symbols):
+    return dict((symbol, quote(symbol)) for symbol in symbols)
+
+
+def candles(symbol, count=5000, step_ms=DAY_MS):
+    rng = random.Random(symbol)
+    price = rng.uniform(5, 500)
+    rows = list()
+    for i in range(count):
+        open_ = price
+        price = max(0.01, price * rng.uniform(0.97, 1.03))
+        rows.append({'open': round(open_, 2),
+                     'high': round(max(open_, price) * 1.01, 2),
+                     'low': round(min(open_, price) * 0.99, 2),
+                     'close': round(price, 2),
+                     'volume': rng.randint(1000, 10000000),
+                     'datetime': START_MS + i * step_ms})
+    return rows
+
+
+def price_history(symbol, count=5000):
+    return {'symbol': symbol, 'empty': False, 'candles': candles(symbol, count)}
+
+
+def movers(index, count=10):
+    rng = random.Random(index)
+    result = list()
+    for i in range(count):
+        symbol = 'MV%02d' % i
+        result.append({'change': round(rng.uniform(-5, 5), 2),
+                       'description': '%s Corp' % symbol,
+                       'direction': 'up',
+                       'last': round(rng.uniform(5, 500), 2),
+                       'symbol': symbol,
+                       'totalVolume': rng.randint(1000, 10000000)})
+    return result
+
+
+def accounts(count=3, positions=200):
+    result = list()
+    for a in range(count):
+        rng = random.Random(a)
+        held = list()
+        for p in range(positions):
+            symbol = 'P%04d' % p
+            quantity = rng.randint(1, 1000)
+            price = rng.uniform(5, 500)
+            held.append({'shortQuantity': 0.0,
+                         'averagePrice': round(price, 4),
+                         'longQuantity': float(quantity),
+                         'marketValue': round(quantity * price * rng.uniform(0.8, 1.2), 2),
+                         'instrument': {'assetType': 'EQUITY', 'cusip': '%09d' % p, 'symbol': symbol}})
+        result.append({'securitiesAccount': {'type': 'MARGIN',
+                                             'accountId': '%08d' % a,
+                                             'positions': held,
+                                             'currentBalances': {'cashBalance': 1000.0 * a,
+                                                                 'liquidationValue': 100000.0 + a,
+                                                                 'equity': 100000.0 + a}}})
+    return result
+
+
+def token():
+    return {'access_token': 'mock-access-token',
+            'refresh_token': 'mock-refresh-token',
+            'token_type': 'Bearer',
+            'expires_in': 1800,
+            'scope': 'PlaceTrades AccountAccess MoveMoney'}
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+
+"""
+    Local stand-in for the URLs.ROOT endpoints.
+
+        server = MockServer()
+        server.start()
+        client = server.client()      # a Client routed to the mock
+        client.get_quotes('AAPL,MSFT')
+        server.stop()
+
+    Payloads come from benchmarks.fixtures and are encoded once per url,
+    so the server side cost stays small and constant between runs.
+"""
+
+import re
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+import ujson
+from requests.adapters import HTTPAdapter
+
+from pyameritrade.client import Client
+from pyameritrade.urls import URLs
+from benchmarks import fixtures
+
+
+ROOT_PATH = urlsplit(URLs.ROOT.value).path
+
+ROUTES = ((re.compile(r'^/marketdata/quotes$'),
+               lambda match, query: fixtures.quotes(query['symbol'][0].split(','))),
+          (re.compile(r'^/marketdata/(.+)/pricehistory$'),
+               lambda match, query: fixtures.price_history(match.group(1))),
+          (re.compile(r'^/marketdata/(.+)/movers$'),
+               lambda match, query: fixtures.movers(match.group(1))),
+          (re.compile(r'^/accounts$'),
+               lambda match, query: fixtures.accounts()),
+          (re.compile(r'^/oauth2/token$'),
+               lambda match, query: fixtures.token()),
+         )
+
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body go out in separate writes, don't let
+    # Nagle + delayed ACK add 40ms to every response
+    disable_nagle_algorithm = True
+
+    def _respond(self):
+        url = urlsplit(self.path)
+        path = url.path[len(ROOT_PATH):] if url.path.startswith(ROOT_PATH) else url.path
+
+        body = self.server.cache.get(self.path)
+        if body is None:
+            for regex, payload in ROUTES:
+                match = regex.match(path)
+                if match:
+                    body = ujson.dumps(payload(match, parse_qs(url.query))).encode('utf-8')
+                    self.server.cache[self.path] = body
+                    break
+
+        if body is None:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def do_GET(self):
+        if self.headers.get('Authorization') in self.server.revoked:
+            self.send_error(401)
+            return
+        self._respond()
+
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self._respond()
+
+
+    def log_message(self, format, *args):
+        pass
+
+
+
+class MockAdapter(HTTPAdapter):
+    """
+        Sends anything addressed to URLs.ROOT to the mock server instead.
+    """
+
+    def __init__(self, base, **kwargs):
+        self.base = base
+        HTTPAdapter.__init__(self, **kwargs)
+
+
+    def send(self, request, **kwargs):
+        request.url = request.url.replace(URLs.ROOT.value, self.base + ROOT_PATH, 1)
+        return HTTPAdapter.send(self, request, **kwargs)
+
+
+
+class MockServer():
+    def __init__(self, host='127.0.0.1', port=0):
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.cache = dict()
+        # Authorization headers answered with 401, to exercise token refresh
+        self.httpd.revoked = set()
+        self.thread = None
+
+
+    @property
+    def revoked(self):
+        return self.httpd.revoked
+
+
+    @property
+    def base(self):
+        return 'http://%s:%d' % self.httpd.server_address[:2]
+
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+    def client(self, pool_maxsize=16, **kwargs):
+        """
+            Unthrottled Client with the API root mounted on the mock
+        """
+        kwargs.setdefault('requests_per_minute', None)
+        client = Client('benchmark', self.base, pool_maxsize=pool_maxsize, **kwargs)
+        client.session.mount(URLs.ROOT.value, MockAdapter(self.base, pool_maxsize=pool_maxsize))
+        client.session.headers['Authorization'] = 'Bearer mock-access-token'
+        return client
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+"""
+    End-to-end benchmarks against the local mock server.
+
+        python -m benchmarks.run [--only get_quotes] [--output results.json]
+
+    Results are written to benchmarks/results/<commit>.json by default,
+    diff two runs with benchmarks.compare.
+"""
+
+import os
+import sys
+import time
+import json
+import logging
+import argparse
+import platform
+import subprocess
+
+import ujson
+
+from pyameritrade.urls import URLs
+from pyameritrade.items import Quote, candle_frame
+from pyameritrade.response import Response
+from benchmarks import fixtures
+from benchmarks.mock_server import MockServer
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+SYMBOLS = ['S%04d' % i for i in range(3000)]
+
+
+def scenarios(client):
+    """
+        name -> (callable, iterations)
+    """
+    quotes_body = ujson.dumps(fixtures.quotes(SYMBOLS[:1000]))
+    quotes_json = ujson.loads(quotes_body)
+    candles = fixtures.candles('AAPL')
+
+    def price_history():
+        return client.get_price_history('AAPL', period_type='year', period=20, frequency_type='daily').candles
+
+    return [('get_quotes[10]',            (lambda: client.get_quotes(','.join(SYMBOLS[:10])), 200)),
+            ('get_bulk_quotes[3000]',     (lambda: client.get_bulk_quotes(SYMBOLS), 10)),
+            ('get_price_history[5000]',   (price_history, 30)),
+            ('get_movers',                (lambda: client.get_movers('$SPX.X'), 200)),
+            ('get_linked_accounts[3x200]',(lambda: client.get_linked_accounts(fields='positions'), 50)),
+            ('decode_parse_quotes[1000]', (lambda: Response.parsers[URLs.QUOTES](ujson.loads(quotes_body), client), 50)),
+            ('construct_quotes[1000]',    (lambda: [Quote(s, q, client) for s, q in quotes_json.items()], 100)),
+            ('candle_frame[5000]',        (lambda: candle_frame(candles), 50)),
+           ]
+
+
+def measure(func, iterations, warmup=2):
+    for _ in range(warmup):
+        func()
+
+    latencies = list()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {'iterations': iterations,
+            'ops_per_sec': iterations / elapsed,
+            'mean_ms': elapsed / iterations * 1000,
+            'p50_ms': latencies[len(latencies) // 2] * 1000,
+            'p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+           }
+
+
+def commit():
+    try:
+        rev = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+        dirty = subprocess.call(['git', 'diff', '--quiet', 'HEAD'], stderr=subprocess.DEVNULL)
+        return rev + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', action='append', help='run only scenarios starting with this name')
+    parser.add_argument('--output', help='results file, default benchmarks/results/<commit>.json')
+    args = parser.parse_args(argv)
+
+    # pyameritrade.utils sets the root logger to INFO
+    logging.getLogger().setLevel(logging.WARNING)
+
+    server = MockServer().start()
+    client = server.client(quote_ttl=0)
+
+    results = dict()
+    try:
+        for name, (func, iterations) in scenarios(client):
+            if args.only and not any(name.startswith(only) for only in args.only):
+                continue
+            results[name] = measure(func, iterations)
+            print("%-28s %10.1f ops/s  mean %8.3f ms  p50 %8.3f ms  p95 %8.3f ms" % (
+                  name, results[name]['ops_per_sec'], results[name]['mean_ms'],
+                  results[name]['p50_ms'], results[name]['p95_ms']))
+    finally:
+        client.close()
+        server.stop()
+
+    rev = commit()
+    output = args.output or os.path.join(RESULTS_DIR, '%s.json' % rev)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as fo:
+        json.dump({'commit': rev,
+                   'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                   'python': platform.python_version(),
+                   'platform': platform.platform(),
+                   'results': results}, fo, indent=2, sort_keys=True)
+    print("\nwrote %s" % output)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -16,6 +16,8 @@ if __name__ == '__main__':
     am_client.authenticate()
 
     movers = am_client.get_movers("$SPX.X", direction='up', change='value')
+    # one quote request for all the movers instead of one each
+    movers.prefetch_quotes()
     for m in movers:
         #m.price_history(period_type='day', period=1, frequency_type='minute', frequency=5)
         off_high = (1 - (m.quote.lastPrice/m.quote._52WkHigh))*100
@@ -32,6 +34,7 @@ if __name__ == '__main__':
     instrument = am_client.get_instrument('PTN')
 
     instruments = am_client.search_instruments(r'XT.*', 'symbol-regex')
+    instruments.prefetch_price_history(period_type='day', period=1, frequency_type='minute', frequency=5)
     for instrument in instruments:
         instrument.price_history(period_type='day', period=1, frequency_type='minute', frequency=5)
 
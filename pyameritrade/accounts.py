@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+
+import logging
+from collections import namedtuple
+
+import numpy
+
+
+# change is 'opened', 'closed' or 'resized', quantity is long - short
+PositionChange = namedtuple('PositionChange', ('account_id', 'symbol', 'change', 'quantity',
+                                               'previous_quantity', 'average_price', 'market_value'))
+
+BalanceChange = namedtuple('BalanceChange', ('account_id', 'field', 'value', 'previous', 'delta'))
+
+# change is 'removed', an account that is no longer returned
+AccountChange = namedtuple('AccountChange', ('account_id', 'change'))
+
+
+class PositionTable():
+    """
+        One account's positions as columns, sorted by symbol.
+    """
+
+    def __init__(self, symbols, asset_types, long, short, average_price, market_value):
+        self.symbols = symbols
+        self.asset_types = asset_types
+        self.long = long
+        self.short = short
+        self.average_price = average_price
+        self.market_value = market_value
+
+
+    @classmethod
+    def from_json(klass, positions):
+        count = len(positions)
+        symbols = numpy.array([p['instrument']['symbol'] for p in positions], dtype=str)
+        asset_types = numpy.array([p['instrument'].get('assetType', '') for p in positions], dtype=str)
+        columns = [numpy.fromiter((p.get(field) or 0.0 for p in positions), dtype='float64', count=count)
+                   for field in ('longQuantity', 'shortQuantity', 'averagePrice', 'marketValue')]
+
+        unique, first, inverse = numpy.unique(symbols, return_index=True, return_inverse=True)
+        if len(unique) == count:
+            return klass(unique, asset_types[first], *(column[first] for column in columns))
+
+        # the same symbol held more than once, ie. in several lots
+        long, short, average_price, market_value = columns
+        long_total = numpy.bincount(inverse, long, len(unique))
+        short_total = numpy.bincount(inverse, short, len(unique))
+        # each lot weighs by its size, long or short
+        lots = long + short
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            average_price = numpy.bincount(inverse, average_price * lots, len(unique)) / (long_total + short_total)
+        return klass(unique, asset_types[first],
+                     long_total,
+                     short_total,
+                     numpy.nan_to_num(average_price),
+                     numpy.bincount(inverse, market_value, len(unique)))
+
+
+    @property
+    def quantity(self):
+        return self.long - self.short
+
+
+    def __len__(self):
+        return len(self.symbols)
+
+
+    def __contains__(self, symbol):
+        i = numpy.searchsorted(self.symbols, symbol)
+        return i < len(self.symbols) and self.symbols[i] == symbol
+
+
+    def get(self, symbol):
+        i = numpy.searchsorted(self.symbols, symbol)
+        if i == len(self.symbols) or self.symbols[i] != symbol:
+            return None
+        return dict(symbol=symbol, assetType=str(self.asset_types[i]), longQuantity=float(self.long[i]),
+                    shortQuantity=float(self.short[i]), averagePrice=float(self.average_price[i]),
+                    marketValue=float(self.market_value[i]))
+
+
+    def to_frame(self):
+        import pandas
+
+        return pandas.DataFrame(dict(assetType=self.asset_types,
+                                     longQuantity=self.long,
+                                     shortQuantity=self.short,
+                                     averagePrice=self.average_price,
+                                     marketValue=self.market_value),
+                                index=pandas.Index(self.symbols, name='symbol'))
+
+
+    def diff(self, previous, account_id=None, tolerance=1e-9):
+        """
+            PositionChanges from 'previous' to this table
+        """
+        changes = list()
+        quantity, before = self.quantity, previous.quantity
+
+        common, old, new = numpy.intersect1d(previous.symbols, self.symbols,
+                                             assume_unique=True, return_indices=True)
+
+        opened = numpy.ones(len(self), dtype=bool)
+        opened[new] = False
+        for i in numpy.flatnonzero(opened):
+            changes.append(PositionChange(account_id, str(self.symbols[i]), 'opened', float(quantity[i]), 0.0,
+                                          float(self.average_price[i]), float(self.market_value[i])))
+
+        closed = numpy.ones(len(previous), dtype=bool)
+        closed[old] = False
+        for i in numpy.flatnonzero(closed):
+            changes.append(PositionChange(account_id, str(previous.symbols[i]), 'closed', 0.0, float(before[i]),
+                                          float(previous.average_price[i]), 0.0))
+
+        resized = numpy.abs(quantity[new] - before[old]) > tolerance
+        for i, j in zip(new[resized], old[resized]):
+            changes.append(PositionChange(account_id, str(self.symbols[i]), 'resized', float(quantity[i]),
+                                          float(before[j]), float(self.average_price[i]),
+                                          float(self.market_value[i])))
+        return changes
+
+
+
+class AccountTracker():
+    """
+        Keeps the last position table and balances of each linked account
+        and turns every poll into just what changed.
+
+            tracker = AccountTracker(client)
+
+            @tracker.on_change
+            def changed(change):
+                print(change)
+
+            while True:
+                tracker.poll()
+                time.sleep(5)
+
+        Balances are the numeric 'currentBalances' fields.  A balance change
+        is only reported once it moves by more than 'tolerance' from the
+        last reported value.  Hooks that
+        raise are logged and otherwise ignored, as for Instrumentation.
+    """
+    logger = logging.getLogger('pyameritrade.AccountTracker')
+
+    def __init__(self, client=None, balances='currentBalances', tolerance=1e-6):
+        self.client = client
+        self.balance_field = balances
+        self.tolerance = tolerance
+
+        # accountId -> PositionTable / {field: value}
+        self.positions = dict()
+        self.balances = dict()
+
+        self.change_hooks = list()
+
+
+    def on_change(self, hook):
+        self.change_hooks.append(hook)
+        return hook
+
+
+    def poll(self):
+        """
+            Fetch the linked accounts with positions and return the changes
+            since the last poll.  The first poll reports every position as
+            opened.
+        """
+        return self.update(self.client.get_linked_accounts(fields='positions', stream=True))
+
+
+    def update(self, accounts, complete=True):
+        """
+            Changes from Account items, or raw 'securitiesAccount' json.
+
+            With complete=True 'accounts' is every linked account, and a
+            known account missing from it is reported as removed with all
+            of its positions closed.  Pass complete=False to update from
+            just some of them.
+        """
+        changes = list()
+        seen = set()
+        for account in accounts:
+            json = getattr(account, 'json', account)
+            account_id = json['accountId']
+            seen.add(account_id)
+
+            table = PositionTable.from_json(json.get('positions', ()))
+            previous = self.positions.get(account_id)
+            if previous is None:
+                previous = PositionTable.from_json(())
+            changes.extend(table.diff(previous, account_id))
+            self.positions[account_id] = table
+
+            balances = dict((field, float(value)) for field, value in json.get(self.balance_field, {}).items()
+                            if isinstance(value, (int, float)) and not isinstance(value, bool))
+            # the baseline only moves when a change is reported,
+            # so a slow drift is reported once it adds up
+            baseline = self.balances.setdefault(account_id, {})
+            for field, value in balances.items():
+                previous_value = baseline.get(field)
+                if previous_value is None or abs(value - previous_value) > self.tolerance:
+                    previous_value = previous_value or 0.0
+                    changes.append(BalanceChange(account_id, field, value, previous_value, value - previous_value))
+                    baseline[field] = value
+
+        if complete:
+            for account_id in [a for a in self.positions if a not in seen]:
+                changes.extend(PositionTable.from_json(()).diff(self.positions.pop(account_id), account_id))
+                self.balances.pop(account_id, None)
+                changes.append(AccountChange(account_id, 'removed'))
+
+        if changes:
+            self.logger.info("%d account changes", len(changes))
+        for change in changes:
+            self.logger.debug("%s", change)
+            for hook in self.change_hooks:
+                try:
+                    hook(change)
+                except Exception:
+                    self.logger.exception("Account change hook %r failed", hook)
+        return changes
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+
+import asyncio
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from pyameritrade.client import Client
+from pyameritrade.rest_api import RestAPI, QUOTE_CHUNK_SIZE, chunk_symbols
+
+
+class AsyncClient(RestAPI):
+    """
+        asyncio front end to a regular Client.
+
+        Every RestAPI method returns an awaitable.  The requests themselves
+        run on the wrapped Client in a thread pool, so parsing, item types
+        and the 401 token refresh are exactly the same as the blocking
+        Client.  Items keep a reference to the wrapped Client, so lazy
+        attributes like Mover.quote are still blocking calls.
+
+            client = AsyncClient(Client.from_config('client.config'))
+            await client.authenticate()
+            quotes, movers = await client.gather(client.get_quotes('AAPL'),
+                                                 client.get_movers('$SPX.X'))
+    """
+    logger = logging.getLogger('pyameritrade.AsyncClient')
+
+    def __init__(self, client, max_workers=16):
+        self.client = client
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        # one pooled connection per worker, otherwise the threads queue up
+        # on the default pool of 10 and reconnect
+        if self.client.pool_maxsize < max_workers:
+            self.client.pool_maxsize = max_workers
+            self.client.mount_adapters()
+
+
+    @classmethod
+    def from_config(klass, path, max_workers=16):
+        return klass(Client.from_config(path), max_workers=max_workers)
+
+
+    def __getattr__(self, name):
+        # client_id, redirect_url, auth_token, etc. live on the wrapped Client
+        if name == 'client':
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+
+    async def authenticate(self):
+        return await self._run(self.client.authenticate)
+
+
+    async def grant_refresh_token(self):
+        return await self._run(self.client.grant_refresh_token)
+
+
+    async def refresh_access_token(self, generation=None):
+        return await self._run(self.client.refresh_access_token, generation)
+
+
+    async def get(self, url, params=None, headers=None, timeout=None, **kwargs):
+        # a streamed response is a generator doing blocking reads,
+        # which would stall the event loop
+        if kwargs.get('stream'):
+            raise TypeError("stream=True is not supported by AsyncClient")
+        return await self._run(self.client.get, url, params=params, headers=headers, timeout=timeout, **kwargs)
+
+
+    async def post(self, url, params, headers=None, timeout=None, **kwargs):
+        return await self._run(self.client.post, url, params, headers=headers, timeout=timeout, **kwargs)
+
+
+    async def get_quote(self, symbol):
+        return await self._run(self.client.get_quote, symbol)
+
+
+    async def get_bulk_quotes(self, symbols, chunk_size=QUOTE_CHUNK_SIZE):
+        """
+            Same as RestAPI.get_bulk_quotes, with the chunks fanned out
+            over the worker pool.
+        """
+        chunks = [','.join(chunk) for chunk in chunk_symbols(symbols, chunk_size)]
+        results = await self.gather(*(self.get_quotes(chunk) for chunk in chunks))
+        return self._merge_quotes(results)
+
+
+    async def iter_price_histories(self, symbols, start_date, **kwargs):
+        """
+            Async iterator over RestAPI.iter_price_histories, the requests
+            run on the wrapped Client's own pool.
+
+                async for symbol, ph, error in client.iter_price_histories(symbols, start):
+        """
+        results = self.client.iter_price_histories(symbols, start_date, **kwargs)
+        try:
+            while True:
+                result = await self._run(next, results, None)
+                if result is None:
+                    break
+                yield result
+        finally:
+            results.close()
+
+
+    async def get_price_histories(self, symbols, start_date, **kwargs):
+        return await self._run(self.client.get_price_histories, symbols, start_date, **kwargs)
+
+
+    async def gather(self, *calls, return_exceptions=False):
+        """
+            Fan out any number of RestAPI calls and wait for all of them.
+            Results come back in the order the calls were given.
+        """
+        return await asyncio.gather(*calls, return_exceptions=return_exceptions)
+
+
+    async def map(self, method, *iterables, return_exceptions=False):
+        """
+            await client.map(client.get_price_history, ['AAPL', 'MSFT', 'GOOG'])
+        """
+        return await self.gather(*(method(*args) for args in zip(*iterables)),
+                                 return_exceptions=return_exceptions)
+
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.client.close()
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+
+class QuoteCache():
+    """
+        Client level quote cache shared by every item.
+
+        Quotes older than 'ttl' seconds are never served, and once more
+        than 'maxsize' symbols are held the least recently used one is
+        evicted.  A ttl of 0 or None turns caching off.
+    """
+    logger = logging.getLogger('pyameritrade.QuoteCache')
+
+    def __init__(self, ttl=5.0, maxsize=5000, clock=time.monotonic):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+
+        # symbol -> (expires, quote), oldest access first
+        self._quotes = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def get(self, symbol):
+        symbol = symbol.upper()
+        with self._lock:
+            entry = self._quotes.get(symbol)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires, quote = entry
+            if expires <= self.clock():
+                del self._quotes[symbol]
+                self.misses += 1
+                return None
+
+            self._quotes.move_to_end(symbol)
+            self.hits += 1
+            return quote
+
+
+    def put(self, quote):
+        self.update((quote,))
+
+
+    def update(self, quotes):
+        if not self.ttl:
+            return
+
+        expires = self.clock() + self.ttl
+        with self._lock:
+            for quote in quotes:
+                symbol = quote.symbol.upper()
+                self._quotes[symbol] = (expires, quote)
+                self._quotes.move_to_end(symbol)
+
+            while len(self._quotes) > self.maxsize:
+                self._quotes.popitem(last=False)
+
+
+    def invalidate(self, *symbols):
+        """
+            Drop the given symbols, or everything if none are given.
+        """
+        with self._lock:
+            if not symbols:
+                self._quotes.clear()
+                return
+            for symbol in symbols:
+                self._quotes.pop(symbol.upper(), None)
+
+
+    def __len__(self):
+        return len(self._quotes)
+
+
+    def __contains__(self, symbol):
+        return self.get(symbol) is not None
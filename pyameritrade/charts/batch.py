@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+"""
+    Render one chart file per symbol across a process pool.
+
+        report = render_batch(histories, 'charts/', simple_averages=(50, 200))
+        print(report['charts_per_second'])
+
+    Figures are built here as plain dicts rather than through Chart, which
+    validates and deep copies every trace.  The layout and plotly config
+    are built once and handed to each worker when it starts, plotly.min.js
+    is written to the output directory once and every file links to it.
+"""
+
+import os
+import time
+import logging
+from urllib.parse import quote
+from concurrent.futures import ProcessPoolExecutor
+
+import plotly
+
+from pyameritrade import indicators
+from pyameritrade.charts import downsample
+
+
+logger = logging.getLogger('pyameritrade.charts.batch')
+
+CONFIG = {'scrollZoom': True}
+
+# set in each worker by _init
+_shared = dict()
+
+
+def layout_template(show_volume=True):
+    """
+        The Chart.plot layout for a single symbol: log price axis with the
+        volume bars underneath, sharing the date axis.
+    """
+    layout = dict(xaxis=dict(type='date', anchor='y2' if show_volume else 'y'),
+                  yaxis=dict(type='log', autorange=True, domain=[0.2, 1.0] if show_volume else [0.0, 1.0]),
+                  showlegend=True,
+                 )
+    if show_volume:
+        layout['yaxis2'] = dict(domain=[0.0, 0.2], anchor='x')
+    return layout
+
+
+def _ms(index):
+    # epoch ms plot on a date axis without turning each bar into a Timestamp
+    return index.as_unit('ms').asi8
+
+
+def _line(x, y, max_points, method, webgl_threshold, **kwargs):
+    x, y = downsample.reduce(x, y, max_points, method)
+    gl = webgl_threshold is not None and len(x) > webgl_threshold
+    return dict(type='scattergl' if gl else 'scatter', x=_ms(x), y=y, **kwargs)
+
+
+def figure(symbol, candles, layout, style='Scatter', simple_averages=(), exp_averages=(),
+           show_volume=True, max_points=2000, method='lttb', webgl_threshold=1000):
+    """
+        Chart of one symbol as a plotly figure dict
+    """
+    lines = dict(max_points=max_points, method=method, webgl_threshold=webgl_threshold)
+    bars = downsample.ohlc(candles, max_points)
+
+    if style == 'Scatter':
+        price = _line(candles.index, candles['close'].values, name=symbol, **lines)
+        if show_volume:
+            price['fill'] = 'tozeroy'
+    elif style in ('Candlestick', 'Ohlc'):
+        price = dict(type=style.lower(), x=_ms(bars.index), name=symbol,
+                     open=bars['open'].values, high=bars['high'].values,
+                     low=bars['low'].values, close=bars['close'].values)
+    else:
+        raise TypeError("Unhandled style '%s'" % style)
+
+    data = [price]
+    if show_volume:
+        data.append(dict(type='bar', x=_ms(bars.index), y=bars['volume'].values,
+                         name='Volume', yaxis='y2'))
+
+    close = candles['close'].values
+    for type_, func, averages in (('SMA', indicators.sma, simple_averages),
+                                  ('EMA', indicators.ema, exp_averages)):
+        for average in averages or ():
+            data.append(_line(candles.index, func(close, average),
+                              name='%s day %s' % (average, type_), **lines))
+
+    return dict(data=data, layout=dict(layout, title=symbol))
+
+
+def _init(layout, config, output_dir, options):
+    _shared.update(layout=layout, config=config, output_dir=output_dir, options=options)
+
+
+def _render(job):
+    symbol, candles = job
+    path = os.path.join(_shared['output_dir'], quote(symbol, safe='') + '.html')
+    try:
+        plotly.offline.plot(figure(symbol, candles, _shared['layout'], **_shared['options']),
+                            filename=path,
+                            auto_open=False,
+                            include_plotlyjs='directory',
+                            config=_shared['config'],
+                            validate=False)
+    except Exception as e:
+        return symbol, None, '%s: %s' % (type(e).__name__, e)
+    return symbol, path, None
+
+
+def render_batch(histories, output_dir, processes=None, config=CONFIG, chunksize=4, **options):
+    """
+        Render an HTML chart for each PriceHistory in 'histories' into
+        'output_dir', named by symbol.  'options' are passed on to
+        figure(), ie. style, simple_averages, exp_averages, max_points.
+
+        Returns a report dict: 'charts' maps symbol -> path, 'failed' maps
+        symbol -> error, plus 'seconds', 'bytes' and 'charts_per_second'.
+
+        Workers may be started by re-importing the caller's main module,
+        so call this from under `if __name__ == '__main__':`.
+    """
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+
+    plotlyjs = os.path.join(output_dir, 'plotly.min.js')
+    if not os.path.exists(plotlyjs):
+        with open(plotlyjs, 'w') as fo:
+            fo.write(plotly.offline.get_plotlyjs())
+
+    jobs = [(ph.symbol, ph.candles) for ph in histories]
+    layout = layout_template(options.get('show_volume', True))
+
+    charts = dict()
+    failed = dict()
+    with ProcessPoolExecutor(processes, initializer=_init,
+                             initargs=(layout, config, output_dir, options)) as pool:
+        for symbol, path, error in pool.map(_render, jobs, chunksize=chunksize):
+            if error:
+                logger.warning("Chart for %s failed: %s", symbol, error)
+                failed[symbol] = error
+            else:
+                charts[symbol] = path
+
+    seconds = time.perf_counter() - start
+    report = dict(charts=charts,
+                  failed=failed,
+                  seconds=seconds,
+                  bytes=sum(os.path.getsize(path) for path in charts.values()),
+                  charts_per_second=len(charts) / seconds if seconds else 0.0,
+                 )
+    logger.info("Rendered %d charts (%d failed) in %.2fs, %.1f charts/s",
+                len(charts), len(failed), seconds, report['charts_per_second'])
+    return report
@@ -7,6 +7,9 @@ import plotly.plotly as py
 import plotly
 import plotly.graph_objs as go
 
+from pyameritrade import indicators
+from pyameritrade.charts import downsample
+
 
 # plotly config options
 # https://github.com/plotly/plotly.js/blob/master/src/plot_api/plot_config.js
@@ -28,6 +31,9 @@ class Chart():
     def __init__(self, ph, style='Scatter',
                  simple_averages=None,
                  exp_averages=None,
+                 max_points=2000,
+                 method='lttb',
+                 webgl_threshold=1000,
                 ):
         """
             for 'ph' accept a PriceHistory item or any iterable with
@@ -35,7 +41,15 @@ class Chart():
 
             Shouldn't it just take a panda's Dataframe with the candles?
             Why depend on the PriceHistory obkect?
+
+            Each trace is cut down to about 'max_points' (None keeps them
+            all): lines with downsample.lttb or .minmax per 'method',
+            candles and volume by merging them into wider bars.  Lines
+            still longer than 'webgl_threshold' are drawn with Scattergl.
         """
+        self.max_points = max_points
+        self.method = method
+        self.webgl_threshold = webgl_threshold
 
         if hasattr(ph, '__iter__'):
             self.show_volume = False
@@ -67,33 +81,46 @@ class Chart():
                  self._trace_averages(ph, 'EMA', exp_averages)
 
 
+    def _line(self, x, y, **kwargs):
+        x, y = downsample.reduce(x, y, self.max_points, self.method)
+        if self.webgl_threshold is not None and len(x) > self.webgl_threshold:
+            return go.Scattergl(x=x, y=y, **kwargs)
+        return go.Scatter(x=x, y=y, **kwargs)
+
+
+    def _bars(self, ph):
+        return downsample.ohlc(ph.candles, self.max_points)
+
+
     def _trace_price(self, yaxis, ph, style):
         if style == 'Scatter':
-            trace = go.Scatter(x=ph.candles['datetime'],
-                              # LOLOLOLOLOL
-                              # I blame it on the Topamax!
-                              y=ph.candles['close'],
-                              name=ph.symbol,
-                              yaxis='y'+str(yaxis)
-                             )
+            trace = self._line(ph.candles.index,
+                               # LOLOLOLOLOL
+                               # I blame it on the Topamax!
+                               ph.candles['close'].values,
+                               name=ph.symbol,
+                               yaxis='y'+str(yaxis)
+                              )
             if self.show_volume:
                 trace.update(dict(fill='tozeroy'))
 
         elif style == 'Candlestick':
-            trace = go.Candlestick(x=ph.candles['datetime'],
-                                   open=ph.candles['open'],
-                                   close=ph.candles['close'],
-                                   high=ph.candles['high'],
-                                   low=ph.candles['low'],
+            candles = self._bars(ph)
+            trace = go.Candlestick(x=candles.index,
+                                   open=candles['open'],
+                                   close=candles['close'],
+                                   high=candles['high'],
+                                   low=candles['low'],
                                    name=ph.symbol,
                                    yaxis='y'+str(yaxis)
                                   )
         elif style == 'Ohlc':
-            trace = go.Ohlc(x=ph.candles['datetime'],
-                            open=ph.candles['open'],
-                            close=ph.candles['close'],
-                            high=ph.candles['high'],
-                            low=ph.candles['low'],
+            candles = self._bars(ph)
+            trace = go.Ohlc(x=candles.index,
+                            open=candles['open'],
+                            close=candles['close'],
+                            high=candles['high'],
+                            low=candles['low'],
                             name=ph.symbol,
                             yaxis='y'+str(yaxis)
                            )
@@ -104,8 +131,9 @@ class Chart():
 
 
     def _trace_volume(self, ph):
-        trace = go.Bar(x=ph.candles['datetime'],
-                       y=ph.candles['volume'],
+        candles = self._bars(ph)
+        trace = go.Bar(x=candles.index,
+                       y=candles['volume'],
                        name='Volume',
                        yaxis='y2')
         self.figure.append_trace(trace, 2, 1)
@@ -113,15 +141,15 @@ class Chart():
 
     def _trace_averages(self, ph, type_, averages):
         for average in averages:
+            close = ph.candles['close'].values
             if type_ == 'SMA':
-                data = ph.candles['close'].rolling(average).mean()
+                data = indicators.sma(close, average)
             elif type_ == 'EMA':
-                data = ph.candles['close'].ewm(span=average).mean()
+                data = indicators.ema(close, average)
             else:
                 raise TypeError("Unhandled average type: %s" % type_)
 
-            trace = go.Scatter(x=ph.candles['datetime'],
-                               y=data,
+            trace = self._line(ph.candles.index, data,
                                name='%s day %s' % (average, type_))
             self.figure.append_trace(trace, 1, 1)
 
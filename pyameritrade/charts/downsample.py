@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+"""
+    Level of detail reduction for charts, so the number of points handed
+    to plotly stays bounded however much history is plotted.
+
+    lttb() and minmax() pick a subset of the points of a line and return
+    their indices; ohlc() merges runs of candles into wider bars.
+"""
+
+import numpy
+import pandas
+
+from pyameritrade.resample import aggregate
+
+
+# average points per bucket below which lttb runs in plain python
+SMALL_BUCKET = 32
+
+
+def lttb(x, y, threshold):
+    """
+        Largest Triangle Three Buckets: keeps the first and last points
+        plus, from each of threshold - 2 buckets, the point forming the
+        largest triangle with the previously kept point and the average
+        of the next bucket.  Follows the visual shape of the line closely.
+    """
+    x = numpy.asarray(x, dtype='float64')
+    y = numpy.asarray(y, dtype='float64')
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return numpy.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    edges = (numpy.arange(threshold - 1) * every).astype(int) + 1
+    counts = numpy.diff(edges)
+
+    # the average point of every bucket, and for the last bucket the
+    # final point, is known up front, only the chosen point carries over
+    mean_x = numpy.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts
+    mean_y = numpy.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+    next_x = numpy.append(mean_x[1:], x[n - 1])
+    next_y = numpy.append(mean_y[1:], y[n - 1])
+
+    keep = numpy.empty(threshold, dtype=int)
+    keep[0] = 0
+    keep[-1] = n - 1
+    if every < SMALL_BUCKET:
+        keep[1:-1] = _lttb_small(x.tolist(), y.tolist(), edges.tolist(), next_x.tolist(), next_y.tolist())
+        return keep
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        area = numpy.abs((x[a] - next_x[i]) * (y[start:end] - y[a]) -
+                         (x[a] - x[start:end]) * (next_y[i] - y[a]))
+        a = start + int(numpy.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def _lttb_small(x, y, edges, next_x, next_y):
+    # the same selection on plain floats, a numpy call per bucket costs
+    # more than the few points in it
+    keep = list()
+    a = 0
+    for i in range(len(edges) - 1):
+        ax, ay = x[a], y[a]
+        dx, dy = ax - next_x[i], next_y[i] - ay
+        best = -1.0
+        for p in range(edges[i], edges[i + 1]):
+            area = abs(dx * (y[p] - ay) - (ax - x[p]) * dy)
+            if area > best:
+                best, a = area, p
+        keep.append(a)
+    return keep
+
+
+def minmax(y, threshold):
+    """
+        The lowest and highest point of each of threshold / 2 buckets, plus
+        the first and last points.  Cheaper than lttb and never loses a
+        spike, at the cost of a more jagged line.
+    """
+    y = numpy.asarray(y, dtype='float64')
+    n = len(y)
+    if threshold >= n or threshold < 4:
+        return numpy.arange(n)
+
+    buckets = threshold // 2
+    # n > threshold, so every bucket holds at least two points
+    edges = numpy.linspace(0, n, buckets + 1).astype(int)
+    bucket = numpy.repeat(numpy.arange(buckets), numpy.diff(edges))
+    lows = _first(y, bucket, numpy.fmin.reduceat(y, edges[:-1]))
+    highs = _first(y, bucket, numpy.fmax.reduceat(y, edges[:-1]))
+    return numpy.unique(numpy.concatenate(([0], lows, highs, [n - 1])))
+
+
+def _first(y, bucket, extremes):
+    # position of the first point equal to its bucket's extreme,
+    # a bucket of only NaN has none
+    hits = numpy.flatnonzero(y == extremes[bucket])
+    _, first = numpy.unique(bucket[hits], return_index=True)
+    return hits[first]
+
+
+METHODS = {'lttb': lambda x, y, threshold: lttb(x, y, threshold),
+           'minmax': lambda x, y, threshold: minmax(y, threshold),
+          }
+
+
+def reduce(x, y, threshold, method='lttb'):
+    """
+        Downsample a line given as an index / DatetimeIndex and values to at
+        most about 'threshold' points.  Leading NaN, as on a moving average,
+        is left out.
+    """
+    values = numpy.asarray(y, dtype='float64')
+    if threshold is None or len(values) <= threshold:
+        return x, y
+
+    valid = numpy.nonzero(~numpy.isnan(values))[0]
+    if isinstance(x, pandas.DatetimeIndex):
+        position = x.asi8[valid]
+    else:
+        position = numpy.asarray(x)[valid]
+
+    keep = valid[METHODS[method](position, values[valid], threshold)]
+    return x[keep], values[keep]
+
+
+def ohlc(candles, bars):
+    """
+        Merge runs of consecutive candles so at most 'bars' are left.  Each
+        merged bar keeps the first open, highest high, lowest low, last close
+        and total volume of its run, and the time of its first candle.
+    """
+    n = len(candles)
+    if bars is None or n <= bars:
+        return candles
+
+    starts = numpy.arange(0, n, -(-n // bars))
+    return aggregate(candles, starts, candles.index[starts])
@@ -1,16 +1,24 @@
 #!/usr/bin/env python
 
 import sys, os
+import time
 import logging
+import threading
 import webbrowser
 
 import requests
 import ujson
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from pyameritrade.rest_api import RestAPI
-from pyameritrade.response import Response
-from pyameritrade.urls import URLs
+from pyameritrade.response import Response, StreamingResponse
+from pyameritrade.urls import URLs, ROUTES
 from pyameritrade.exception import RequestError
+from pyameritrade.cache import QuoteCache
+from pyameritrade.metrics import Instrumentation, endpoint_name
+from pyameritrade.transport import Recorder, Replayer
+from pyameritrade.throttle import RequestScheduler, URL_PRIORITIES, PRIORITY_NORMAL
 from pyameritrade.utils import pp
 
 
@@ -23,21 +31,80 @@ from pyameritrade.utils import pp
 ###############################################
 
 
+# Optional keys of the "client" section of the config file,
+# passed straight through to Client()
+CONFIG_OPTIONS = ('quote_ttl', 'quote_cache_size',
+                  'requests_per_minute', 'burst',
+                  'auto_refresh', 'refresh_margin',
+                  'pool_connections', 'pool_maxsize', 'pool_block',
+                  'retries', 'backoff_factor', 'keep_alive', 'timeout',
+                  'record', 'replay')
+
 
 class Client(RestAPI):
     logger = logging.getLogger('pyameritrade.Client')
 
-    def __init__(self, client_id, redirect_url, server_cert=False, access_code=None):
+    def __init__(self, client_id, redirect_url, server_cert=False, access_code=None,
+                 quote_ttl=5.0, quote_cache_size=5000,
+                 requests_per_minute=120, burst=5,
+                 auto_refresh=True, refresh_margin=60,
+                 pool_connections=10, pool_maxsize=10, pool_block=False,
+                 retries=0, backoff_factor=0.3, keep_alive=True, timeout=(3.05, 27),
+                 metrics=None, record=None, replay=None):
         self.client_id = client_id
         self.redirect_url = redirect_url
         self.server_cert = server_cert
         self.access_code = access_code
 
+        self.quote_cache = QuoteCache(ttl=quote_ttl, maxsize=quote_cache_size)
+
+        # pass an Instrumentation to share metrics between clients
+        self.metrics = metrics or Instrumentation()
+
+        # record=<archive path> saves every response, replay=<archive path>
+        # answers from the archive instead of the network
+        if record and replay:
+            raise TypeError("Pass either record or replay, not both")
+        self.record = record
+        self.replay = replay
+        self._replayer = Replayer(replay) if replay else None
+
+        # requests_per_minute=None turns off throttling,
+        # there is nothing to throttle when replaying
+        self.scheduler = None
+        if requests_per_minute and not replay:
+            self.scheduler = RequestScheduler(requests_per_minute, burst)
+            self.metrics.add_gauge('throttle_queue_depth', 'Requests waiting on the rate limiter',
+                                   lambda: self.scheduler.depth)
+            self.metrics.add_gauge('throttle_wait_seconds_total', 'Time spent waiting on the rate limiter',
+                                   lambda: self.scheduler.total_wait)
+
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.timeout = tuple(timeout) if isinstance(timeout, list) else timeout
+
         self.session = requests.Session()
+        # replay never opens a connection, skip the per request proxy lookup
+        self.session.trust_env = not replay
+        self.mount_adapters()
 
         self.auth_token = None
 
-        self.session.headers = {'Content-Type': 'application/json'}
+        # access token state, see set_access_token()
+        self.access_token = None
+        self.token_expires = None
+        self.auto_refresh = auto_refresh
+        self.refresh_margin = refresh_margin
+        self._token_generation = 0
+        self._token_lock = threading.Lock()
+        self._refresh_timer = None
+
+        self.session.headers.update({'Content-Type': 'application/json'})
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
 
     def authenticate(self):
         try:
@@ -58,6 +125,92 @@ class Client(RestAPI):
             else:
                 raise
 
+        # A token server that keeps the access token fresh tells us when it
+        # expires.  Otherwise we don't know how old the access token is, so
+        # start with a fresh one.  From here on it is refreshed ahead of expiry.
+        if not self._use_server_token():
+            self.refresh_access_token()
+
+
+    def _use_server_token(self):
+        expires_at = getattr(self.auth_token, 'access_token_expires_at', None)
+        if not expires_at:
+            return False
+        remaining = expires_at - time.time()
+        if remaining <= self.refresh_margin:
+            return False
+        self.set_access_token(self.auth_token, expires_in=remaining)
+        return True
+
+
+    def set_access_token(self, token, expires_in=None):
+        """
+            Swap in a new access token and schedule its refresh.
+        """
+        # a single item assignment, so concurrent requests see either
+        # the old or the new header, never a missing one
+        self.session.headers['Authorization'] = 'Bearer %s' % token.access_token
+        self.access_token = token.access_token
+        self._token_generation += 1
+
+        expires_in = expires_in or getattr(token, 'expires_in', None)
+        if expires_in:
+            self.token_expires = time.monotonic() + expires_in
+            self._schedule_refresh(max(expires_in - self.refresh_margin, 1))
+
+
+    def refresh_access_token(self, generation=None):
+        """
+            Single flight token refresh.  Concurrent callers wait on the
+            one refresh in progress.  A caller passing the token generation
+            it sent a failed request with returns straight away if the
+            token was already replaced in the meantime.
+        """
+        with self._token_lock:
+            if generation is not None and generation != self._token_generation:
+                return self.access_token
+
+            # with a central token server, one cheap GET replaces our own refresh
+            if getattr(self.auth_token, 'access_token_expires_at', None):
+                self.logger.info('Fetching token from the token server')
+                self.auth_token = self.get_auth_token()
+                if self._use_server_token():
+                    self.metrics.token_refreshed()
+                    return self.access_token
+
+            self.logger.info('Refreshing token')
+            self.grant_refresh_token()
+            self.metrics.token_refreshed()
+            return self.access_token
+
+
+    def _schedule_refresh(self, delay):
+        if self._refresh_timer:
+            self._refresh_timer.cancel()
+        if not self.auto_refresh:
+            return
+        self._refresh_timer = threading.Timer(delay, self._refresh_in_background)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh_access_token()
+        except Exception:
+            self.logger.exception('Background token refresh failed, retrying in 30s')
+            self._schedule_refresh(30)
+
+
+    def _token_stale(self):
+        return self.token_expires is not None and time.monotonic() >= self.token_expires - self.refresh_margin / 2.0
+
+
+    def close(self):
+        if self._refresh_timer:
+            self._refresh_timer.cancel()
+        self.session.close()
+
 
     @classmethod
     def from_config(klass, path):
@@ -73,40 +226,177 @@ class Client(RestAPI):
         client_id = client['client_id']
         redirect_url = client['redirect_url']
         server_cert = client.get('server_cert', False)
+        options = dict((k, client[k]) for k in CONFIG_OPTIONS if k in client)
 
-        return Client(client_id, redirect_url, server_cert)
+        return Client(client_id, redirect_url, server_cert, **options)
 
 
-    def get(self, url, params=None, headers=None, timeout=(3.05, 27), **kwargs):
-        self.logger.info('GET %s' % url)
+    def mount_adapters(self):
+        """
+            (Re)mount the pooled transport adapters from the pool_* and
+            retry settings.  Retries only apply to idempotent GETs on
+            connection errors and 5xx responses.  A record or replay
+            archive swaps in the matching adapter from transport.py.
+        """
+        retries = Retry(total=self.retries,
+                        backoff_factor=self.backoff_factor,
+                        status_forcelist=(500, 502, 503, 504),
+                        allowed_methods=frozenset(['GET']),
+                        raise_on_status=False)
 
-        response = self.session.get(url, params=params, headers=headers, timeout=timeout, **kwargs)
+        pool = dict(pool_connections=self.pool_connections,
+                    pool_maxsize=self.pool_maxsize,
+                    pool_block=self.pool_block,
+                    max_retries=retries)
 
-        # a 401 will trigger a request to refresh our token 
-        if response.status_code == 401:
-            self.logger.info('Refreshing token')
-            self.grant_refresh_token()
-            self.logger.info('Sending GET request again after refreshing token')
-            response = self.session.get(url, params=params, headers=headers, timeout=timeout, **kwargs)
+        if self._replayer:
+            adapter = self._replayer
+        elif self.record:
+            adapter = Recorder(self.record,
+                               private_urls=(URLs.TOKEN.value, self.redirect_url + URLs.AUTH_TOKEN.value),
+                               **pool)
+        else:
+            adapter = HTTPAdapter(**pool)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
 
-        response = Response(url, response, self)
-        self.logger.debug('GET response: %s' % pp.pformat(response.items))
-        return response.items
+
+    def pool_stats(self):
+        """
+            Per host connection pool usage.  'in_use' close to 'maxsize'
+            means the pool is saturated and requests are waiting (pool_block)
+            or opening throwaway connections.
+        """
+        stats = dict()
+        for adapter in set(self.session.adapters.values()):
+            # a Replayer has no connections
+            if not hasattr(adapter, 'poolmanager'):
+                continue
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                queue = pool.pool
+                idle = sum(1 for conn in list(queue.queue) if conn is not None) if queue else 0
+                available = queue.qsize() if queue else 0
+                stats['%s://%s:%s' % (pool.scheme, pool.host, pool.port)] = {
+                    'maxsize': queue.maxsize if queue else 0,
+                    'in_use': (queue.maxsize - available) if queue else 0,
+                    'idle': idle,
+                    'connections_opened': pool.num_connections,
+                    'requests': pool.num_requests,
+                }
+        return stats
+
+
+    def throttle(self, url, priority=None):
+        """
+            Wait for the rate limiter before sending a request to the API.
+            Without an explicit priority it is looked up from the endpoint.
+        """
+        if self.scheduler is None or not url.startswith(URLs.ROOT.value):
+            return
+        if priority is None:
+            priority = URL_PRIORITIES.get(ROUTES.resolve(url), PRIORITY_NORMAL)
+        self.scheduler.acquire(priority)
+
+
+    def get(self, url, params=None, headers=None, timeout=None, priority=None, stream=False, **kwargs):
+        """
+            With stream=True the body is parsed incrementally and a generator
+            of items is returned instead of the fully parsed response.
+        """
+        self.logger.info('GET %s', url)
+
+        # the background refresh should have beaten us here,
+        # but a sleeping laptop or a failed refresh may not
+        if self._token_stale() and not url.startswith(self.redirect_url):
+            self.refresh_access_token(self._token_generation)
+
+        timeout = timeout or self.timeout
+        endpoint = endpoint_name(url)
+        self.metrics.request(endpoint, 'GET', url)
+
+        try:
+            self.throttle(url, priority)
+            generation = self._token_generation
+            start = time.perf_counter()
+            response = self.session.get(url, params=params, headers=headers, timeout=timeout, stream=stream, **kwargs)
+            network = time.perf_counter() - start
+
+            # a 401 will trigger a request to refresh our token 
+            if response.status_code == 401:
+                response.close()
+                self.refresh_access_token(generation)
+                self.logger.info('Sending GET request again after refreshing token')
+                self.metrics.retry(endpoint)
+                self.throttle(url, priority)
+                start = time.perf_counter()
+                response = self.session.get(url, params=params, headers=headers, timeout=timeout, stream=stream, **kwargs)
+                network += time.perf_counter() - start
+
+            if stream:
+                return self._handle_stream(endpoint, 'GET', url, response, network)
+            return self._handle(endpoint, 'GET', url, response, network)
+        except Exception as e:
+            self.metrics.error(endpoint, 'GET', url, e)
+            raise
+
+
+    def post(self, url, params, headers=None, timeout=None, priority=None, **kwargs):
+        self.logger.info('POST %s', url)
+
+        timeout = timeout or self.timeout
+        endpoint = endpoint_name(url)
+        self.metrics.request(endpoint, 'POST', url)
+
+        try:
+            self.throttle(url, priority)
+
+            # Do we need to check for 401 token expired errors on POST?
+            # Maybe only once we get to the access_token itself expiring
+            start = time.perf_counter()
+            response = self.session.post(url,
+                                     data=params,
+                                     headers=headers,
+                                     timeout=timeout,
+                                     **kwargs
+                                    )
+            network = time.perf_counter() - start
+
+            return self._handle(endpoint, 'POST', url, response, network)
+        except Exception as e:
+            self.metrics.error(endpoint, 'POST', url, e)
+            raise
+
+
+    def _handle_stream(self, endpoint, method, url, raw_response, network):
+        response = StreamingResponse(url, raw_response, self)
+        # only time to headers is known up front, the body is read as it is consumed
+        self.metrics.response(endpoint, method, url,
+                              status=raw_response.status_code,
+                              bytes=0, network=network, decode=0.0, parse=0.0)
+        return iter(response)
 
 
-    def post(self, url, params, headers=None, timeout=(3.05, 27), **kwargs):
-        self.logger.info('POST %s' % url)
+    def _handle(self, endpoint, method, url, raw_response, network):
+        # retries made by the adapter's retry policy
+        retries = getattr(getattr(raw_response.raw, 'retries', None), 'history', None)
+        if retries:
+            self.metrics.retry(endpoint, len(retries))
 
-        # Do we need to check for 401 token expired errors on POST?
-        # Maybe only once we get to the access_token itself expiring
-        response = self.session.post(url,
-                                 data=params,
-                                 headers=headers,
-                                 **kwargs
-                                )
+        response = Response(url, raw_response, self)
+        self.metrics.response(endpoint, method, url,
+                              status=raw_response.status_code,
+                              bytes=len(raw_response.content),
+                              network=network,
+                              decode=response.decode_time,
+                              parse=response.parse_time)
 
-        response = Response(url, response, self)
-        self.logger.debug('POST response: %s' % pp.pformat(response.items))
+        # pformat of a whole payload is expensive, only pay for it when it will be seen
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('%s response: %s' % (method, pp.pformat(response.items)))
         return response.items
 
 
@@ -33,3 +33,13 @@ class RequestError(Exception):
         self.logger.exception(self.message)
         print()
         super().__init__(self, pp.pprint(output))
+
+
+class ReplayMissError(LookupError):
+    """
+        A replayed request that was never recorded
+    """
+    def __init__(self, method, url):
+        self.method = method
+        self.url = url
+        super().__init__("No recorded response for %s %s" % (method, url))
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+
+import os
+import re
+import time
+import bisect
+import logging
+
+import numpy
+import ujson
+
+from pyameritrade.items import Instrument, ItemList
+
+
+# columns kept for each instrument, as returned by search_instruments
+FIELDS = ('symbol', 'cusip', 'description', 'exchange', 'assetType')
+
+
+class InstrumentIndex():
+    """
+        Local copy of instrument reference data, so lookups don't go to
+        the network.
+
+            index = InstrumentIndex('~/.pyameritrade/instruments', client)
+            index.refresh(['A.*', 'B.*'])           # search_instruments per pattern
+            index.get('AAPL')                       # Instrument, or None
+            index.resolve(screen_symbols)           # ItemList of Instruments
+            index.prefix('MS')
+            index.search(r'.*bank.*', field='description')
+
+        The table is held as one list per field, rows sorted by symbol.
+        Symbol and CUSIP go through dicts and prefixes through bisect on
+        the sorted symbols.  On disk it is a compressed .npz of the columns
+        plus a meta.json recording when each pattern was last refreshed.
+    """
+    logger = logging.getLogger('pyameritrade.InstrumentIndex')
+
+    def __init__(self, root, client=None):
+        self.root = os.path.expanduser(root)
+        self.client = client
+
+        self.columns = dict((field, list()) for field in FIELDS)
+        self.refreshed = dict()
+        self._reset()
+        self.load()
+
+
+    def _reset(self):
+        symbols = self.columns['symbol']
+        self.by_symbol = dict((symbol, row) for row, symbol in enumerate(symbols))
+        self.by_cusip = dict((cusip, row) for row, cusip in enumerate(self.columns['cusip']) if cusip)
+        # each row's json, built on first use
+        self._json = [None] * len(symbols)
+
+
+    def __len__(self):
+        return len(self.columns['symbol'])
+
+
+    def __contains__(self, symbol):
+        return symbol.upper() in self.by_symbol
+
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+
+    def load(self):
+        path = self._path('instruments.npz')
+        if not os.path.exists(path):
+            return
+
+        with numpy.load(path) as arrays:
+            self.columns = dict((field, arrays[field].tolist()) for field in FIELDS)
+        with open(self._path('meta.json'), 'r') as fo:
+            self.refreshed = ujson.load(fo)['refreshed']
+        self._reset()
+
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+
+        tmp = self._path('instruments.tmp.npz')
+        numpy.savez_compressed(tmp, **dict((field, numpy.array(values, dtype=str))
+                                          for field, values in self.columns.items()))
+        os.replace(tmp, self._path('instruments.npz'))
+
+        tmp = self._path('meta.tmp')
+        with open(tmp, 'w') as fo:
+            ujson.dump({'refreshed': self.refreshed}, fo)
+        os.replace(tmp, self._path('meta.json'))
+
+
+    def add(self, instruments):
+        """
+            Insert or update rows from Instrument items or raw instrument
+            json.  Returns the number of rows added or changed.
+        """
+        rows = dict()
+        for instrument in instruments:
+            json = getattr(instrument, 'json', instrument)
+            symbol = json.get('symbol')
+            if symbol:
+                rows[symbol.upper()] = tuple(str(json.get(field) or '') for field in FIELDS[1:])
+
+        changed = dict()
+        for symbol, values in rows.items():
+            row = self.by_symbol.get(symbol)
+            if row is None or tuple(self.columns[field][row] for field in FIELDS[1:]) != values:
+                changed[symbol] = values
+        if not changed:
+            return 0
+
+        table = dict((symbol, tuple(self.columns[field][row] for field in FIELDS[1:]))
+                     for symbol, row in self.by_symbol.items())
+        table.update(changed)
+
+        symbols = sorted(table)
+        self.columns = dict(symbol=symbols)
+        for i, field in enumerate(FIELDS[1:]):
+            self.columns[field] = [table[symbol][i] for symbol in symbols]
+        self._reset()
+        return len(changed)
+
+
+    def refresh(self, patterns, max_age=24 * 60 * 60, save=True):
+        """
+            search_instruments(pattern, 'symbol-regex') for each pattern
+            not refreshed within 'max_age' seconds, merged into the index.
+            Rows are only added or updated, never dropped.
+        """
+        changed = 0
+        for pattern in patterns:
+            if time.time() - self.refreshed.get(pattern, 0) < max_age:
+                continue
+            instruments = self.client.search_instruments(pattern, 'symbol-regex')
+            count = self.add(instruments)
+            self.refreshed[pattern] = time.time()
+            self.logger.info("Refreshed %s: %d instruments, %d changed", pattern, len(instruments), count)
+            changed += count
+
+        if save:
+            self.save()
+        return changed
+
+
+    def _item(self, row):
+        json = self._json[row]
+        if json is None:
+            json = self._json[row] = dict((field, self.columns[field][row]) for field in FIELDS)
+        return Instrument(json, self.client)
+
+
+    def get(self, symbol):
+        row = self.by_symbol.get(symbol.upper())
+        return None if row is None else self._item(row)
+
+
+    def get_cusip(self, cusip):
+        row = self.by_cusip.get(cusip)
+        return None if row is None else self._item(row)
+
+
+    def get_instrument(self, cusip):
+        """
+            Same as RestAPI.get_instrument, but from the index when known.
+            A miss goes to the API and is added to the index.
+        """
+        instrument = self.get_cusip(cusip)
+        if instrument is None:
+            instrument = self.client.get_instrument(cusip)
+            self.add([instrument])
+        return instrument
+
+
+    def resolve(self, symbols):
+        """
+            Instruments for the symbols that are in the index, in order
+        """
+        by_symbol = self.by_symbol
+        rows = [by_symbol.get(symbol.upper()) for symbol in symbols]
+        return ItemList((self._item(row) for row in rows if row is not None), client=self.client)
+
+
+    def prefix(self, prefix):
+        """
+            Instruments whose symbol starts with 'prefix'
+        """
+        symbols = self.columns['symbol']
+        prefix = prefix.upper()
+        start = bisect.bisect_left(symbols, prefix)
+        end = bisect.bisect_left(symbols, prefix + '\uffff', start)
+        return ItemList((self._item(row) for row in range(start, end)), client=self.client)
+
+
+    def search(self, pattern, field='symbol', flags=re.IGNORECASE):
+        """
+            Instruments where 'field' fully matches the regex, like the
+            API's 'symbol-regex' and 'desc-regex' projections.
+        """
+        match = re.compile(pattern, flags).fullmatch
+        rows = [row for row, value in enumerate(self.columns[field]) if match(value)]
+        return ItemList((self._item(row) for row in rows), client=self.client)
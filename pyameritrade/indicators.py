@@ -0,0 +1,622 @@
+#!/usr/bin/env python
+
+"""
+    Technical indicators over candle columns.
+
+    The kernels take a 1-d series, or a 2-d (symbols, bars) array to
+    compute many symbols in one call, and return arrays of the same shape.
+    Shorter histories in a batch are NaN padded on the left, see stack().
+    NaN is only understood as left padding, not as gaps inside a series.
+
+        close = ph.candles['close'].values
+        rsi(close, 14)
+
+        closes = stack(histories, 'close')
+        macd_line, signal, hist = macd(closes)
+
+    Each indicator also has a class keeping just enough state to take the
+    next bar in O(1), for one symbol or a whole batch at once:
+
+        state = RSI.from_series(closes, 14)
+        state.update(latest_closes)
+"""
+
+import numpy
+
+
+# bars per block in _filter, the cost is rows * bars * BLOCK multiply-adds
+BLOCK = 64
+
+
+def _rows(x):
+    x = numpy.asarray(x, dtype='float64')
+    return x.reshape(-1, x.shape[-1]), x.shape
+
+
+def _first_valid(x):
+    valid = ~numpy.isnan(x)
+    first = numpy.argmax(valid, axis=-1)
+    first[~valid.any(axis=-1)] = x.shape[-1]
+    return first
+
+
+def _shift(x):
+    shifted = numpy.empty_like(x)
+    shifted[:, 0] = numpy.nan
+    shifted[:, 1:] = x[:, :-1]
+    return shifted
+
+
+def _rolling_sum(x, n):
+    # cumulative sums taken about each row's first value keep the
+    # cancellation error from growing with the price level
+    offset = numpy.take_along_axis(x, numpy.minimum(_first_valid(x), x.shape[-1] - 1)[:, None], axis=-1)
+    offset = numpy.nan_to_num(offset)
+    valid = ~numpy.isnan(x)
+    centered = numpy.where(valid, x - offset, 0.0)
+
+    total = numpy.cumsum(centered, axis=-1)
+    total[:, n:] -= total[:, :-n].copy()
+    count = numpy.cumsum(valid, axis=-1)
+    count[:, n:] -= count[:, :-n].copy()
+
+    total[count < n] = numpy.nan
+    return total, offset
+
+
+def _filter(z, alpha):
+    """
+        y[t] = (1 - alpha) * y[t-1] + alpha * z[t] from y[-1] = 0, along
+        each row.  The recursion is unrolled BLOCK bars at a time into a
+        matrix product, so the python loop runs bars / BLOCK times no
+        matter how many rows there are.
+    """
+    decay = 1.0 - alpha
+    lags = numpy.arange(BLOCK)
+    powers = decay ** lags
+    weights = numpy.tril(alpha * powers[numpy.subtract.outer(lags, lags).clip(0)])
+    carry = decay * powers
+
+    out = numpy.empty_like(z)
+    previous = numpy.zeros(z.shape[0])
+    for start in range(0, z.shape[-1], BLOCK):
+        block = z[:, start:start + BLOCK]
+        m = block.shape[-1]
+        y = block.dot(weights[:m, :m].T) + previous[:, None] * carry[:m]
+        out[:, start:start + m] = y
+        previous = y[:, -1]
+    return out
+
+
+def _ewm(x, n, alpha):
+    """
+        Exponential average seeded with the simple average of the first n
+        values of each row.  NaN until the seed.
+    """
+    bars = x.shape[-1]
+    start = _first_valid(x) + n - 1
+    seeded = start < bars
+    rows = numpy.nonzero(seeded)[0]
+
+    first = start[rows, None] - n + 1
+    seed = x[rows[:, None], first + numpy.arange(n)].mean(axis=-1)
+
+    # with y[start - 1] = 0, an input of seed / alpha at 'start' puts
+    # the seed in y[start] and the recursion carries on from there
+    z = numpy.where(numpy.isnan(x), 0.0, x)
+    z[numpy.arange(bars) < start[:, None]] = 0.0
+    z[rows, start[rows]] = seed / alpha
+
+    out = _filter(z, alpha)
+    out[numpy.arange(bars) < start[:, None]] = numpy.nan
+    return out
+
+
+def sma(x, n):
+    """
+        Simple moving average over n bars
+    """
+    x, shape = _rows(x)
+    total, offset = _rolling_sum(x, n)
+    return (total / n + offset).reshape(shape)
+
+
+def ema(x, n, alpha=None):
+    """
+        Exponential moving average, alpha defaults to 2 / (n + 1).  The
+        first value is the simple average of the first n bars.
+    """
+    x, shape = _rows(x)
+    return _ewm(x, n, alpha or 2.0 / (n + 1)).reshape(shape)
+
+
+def _rsi(gain, loss):
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        value = 100.0 * gain / (gain + loss)
+    # no movement at all over the period
+    return numpy.where((gain == 0) & (loss == 0), 50.0, value)
+
+
+def rsi(close, n=14):
+    """
+        Wilder's relative strength index
+    """
+    close, shape = _rows(close)
+    delta = close - _shift(close)
+    gain = _ewm(numpy.clip(delta, 0, None), n, 1.0 / n)
+    loss = _ewm(numpy.clip(-delta, 0, None), n, 1.0 / n)
+    return _rsi(gain, loss).reshape(shape)
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    """
+        (macd, signal, histogram)
+    """
+    close, shape = _rows(close)
+    line = _ewm(close, fast, 2.0 / (fast + 1)) - _ewm(close, slow, 2.0 / (slow + 1))
+    trigger = _ewm(line, signal, 2.0 / (signal + 1))
+    return line.reshape(shape), trigger.reshape(shape), (line - trigger).reshape(shape)
+
+
+def bollinger(close, n=20, k=2.0):
+    """
+        (middle, upper, lower) bands, k population standard deviations
+        either side of the n bar simple average
+    """
+    close, shape = _rows(close)
+    total, offset = _rolling_sum(close, n)
+    squares, shift = _rolling_sum((close - offset) ** 2, n)
+    squares += n * shift
+    mean = total / n
+    std = numpy.sqrt(numpy.clip(squares / n - mean ** 2, 0, None))
+    middle = mean + offset
+    return middle.reshape(shape), (middle + k * std).reshape(shape), (middle - k * std).reshape(shape)
+
+
+def _true_range(high, low, previous):
+    return numpy.fmax(high - low, numpy.fmax(numpy.abs(high - previous), numpy.abs(low - previous)))
+
+
+def atr(high, low, close, n=14):
+    """
+        Wilder's average true range
+    """
+    close, shape = _rows(close)
+    high, _ = _rows(high)
+    low, _ = _rows(low)
+    return _ewm(_true_range(high, low, _shift(close)), n, 1.0 / n).reshape(shape)
+
+
+def _grouped_cumsum(x, reset):
+    total = numpy.cumsum(x, axis=-1)
+    if reset is None:
+        return total
+    bars = numpy.arange(x.shape[-1])
+    start = numpy.maximum.accumulate(numpy.where(reset, bars, 0), axis=-1)
+    before = total - x
+    return total - numpy.take_along_axis(before, start, axis=-1)
+
+
+def vwap(high, low, close, volume, reset=None):
+    """
+        Volume weighted average of the typical price (h + l + c) / 3.
+
+        Cumulative over the whole series, or restarting on every bar
+        where 'reset' is True, ie. reset=new_day(ph.candles.index) for
+        a daily VWAP on intraday candles.
+    """
+    close, shape = _rows(close)
+    high, _ = _rows(high)
+    low, _ = _rows(low)
+    volume, _ = _rows(volume)
+    if reset is not None:
+        reset = numpy.broadcast_to(numpy.asarray(reset, dtype=bool), close.shape)
+
+    valid = ~numpy.isnan(close)
+    weighted = numpy.where(valid, (high + low + close) / 3.0 * volume, 0.0)
+    volume = numpy.where(valid, volume, 0.0)
+
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        value = _grouped_cumsum(weighted, reset) / _grouped_cumsum(volume, reset)
+    value[~valid] = numpy.nan
+    return value.reshape(shape)
+
+
+def new_day(index, tz='America/New_York'):
+    """
+        True on the first bar of each exchange day of a DatetimeIndex
+    """
+    days = numpy.asarray(index.tz_convert(tz).normalize().asi8)
+    first = numpy.ones(len(days), dtype=bool)
+    first[1:] = days[1:] != days[:-1]
+    return first
+
+
+def stack(histories, column='close', length=None):
+    """
+        One column of many PriceHistory items as a (symbols, bars) array,
+        aligned on the latest bar with shorter histories NaN padded on the
+        left.  'length' keeps only the last bars of each.
+    """
+    series = [numpy.asarray(ph.candles[column].values, dtype='float64') for ph in histories]
+    if length is None:
+        length = max(len(s) for s in series) if series else 0
+
+    out = numpy.full((len(series), length), numpy.nan)
+    for row, values in enumerate(series):
+        values = values[len(values) - length:] if len(values) > length else values
+        if len(values):
+            out[row, length - len(values):] = values
+    return out
+
+
+
+class _Incremental():
+    """
+        State is held as 1-d arrays, one element per symbol, so a batch
+        updates in a single vectorized step.  A NaN input leaves that
+        symbol's state alone, for symbols with no new bar this time.
+    """
+
+    def _setup(self, x):
+        x = numpy.asarray(x, dtype='float64')
+        self.scalar = x.ndim == 0
+        self.size = x.size
+        return x.reshape(-1)
+
+
+    def _input(self, x):
+        return numpy.asarray(x, dtype='float64').reshape(-1)
+
+
+    def _output(self, value):
+        return value[0] if self.scalar else value
+
+
+    @staticmethod
+    def _last(x):
+        x, shape = _rows(x)
+        return x, len(shape) == 1
+
+
+
+class SMA(_Incremental):
+    def __init__(self, n):
+        self.n = n
+        self.window = None
+
+
+    @classmethod
+    def from_series(klass, x, n):
+        state = klass(n)
+        state.window = _Window.from_series(x, n)
+        return state
+
+
+    def update(self, x):
+        if self.window is None:
+            self.window = _Window(self.n, x)
+        self.window.push(x)
+        return self.value
+
+
+    @property
+    def value(self):
+        w = self.window
+        return w._output(numpy.where(w.count < self.n, numpy.nan, w.mean))
+
+
+
+class EMA(_Incremental):
+    def __init__(self, n, alpha=None):
+        self.n = n
+        self.alpha = alpha or 2.0 / (n + 1)
+        self.current = None
+
+
+    @classmethod
+    def from_series(klass, x, n, alpha=None):
+        state = klass(n, alpha)
+        x, state.scalar = klass._last(x)
+        state.size = x.shape[0]
+        state.current = _ewm(x, n, state.alpha)[:, -1]
+        state.count = (~numpy.isnan(x)).sum(axis=-1)
+        # only read while count < n, when it is the seed's running sum
+        state.total = numpy.nansum(x, axis=-1)
+        return state
+
+
+    def update(self, x):
+        if self.current is None:
+            x = self._setup(x)
+            self.current = numpy.full(self.size, numpy.nan)
+            self.count = numpy.zeros(self.size, dtype=int)
+            self.total = numpy.zeros(self.size)
+        else:
+            x = self._input(x)
+
+        ok = ~numpy.isnan(x)
+        live = ok & ~numpy.isnan(self.current)
+        warming = ok & ~live
+
+        self.count += ok
+        self.total = numpy.where(warming, self.total + x, self.total)
+        self.current = numpy.where(live, self.current + self.alpha * (x - self.current), self.current)
+        self.current = numpy.where(warming & (self.count == self.n), self.total / self.n, self.current)
+        return self.value
+
+
+    @property
+    def value(self):
+        return self._output(self.current)
+
+
+
+class RSI(_Incremental):
+    def __init__(self, n=14):
+        self.n = n
+        self.previous = None
+        self.gain = EMA(n, 1.0 / n)
+        self.loss = EMA(n, 1.0 / n)
+
+
+    @classmethod
+    def from_series(klass, close, n=14):
+        state = klass(n)
+        close, state.scalar = klass._last(close)
+        state.size = close.shape[0]
+        delta = close - _shift(close)
+        state.gain = EMA.from_series(numpy.clip(delta, 0, None), n, 1.0 / n)
+        state.loss = EMA.from_series(numpy.clip(-delta, 0, None), n, 1.0 / n)
+        state.previous = close[:, -1]
+        return state
+
+
+    def update(self, close):
+        if self.previous is None:
+            close = self._setup(close)
+            self.previous = numpy.full(self.size, numpy.nan)
+        else:
+            close = self._input(close)
+
+        delta = close - self.previous
+        self.gain.update(numpy.clip(delta, 0, None))
+        self.loss.update(numpy.clip(-delta, 0, None))
+        self.previous = numpy.where(numpy.isnan(close), self.previous, close)
+        return self.value
+
+
+    @property
+    def value(self):
+        if self.gain.current is None:
+            return numpy.nan
+        return self._output(_rsi(self.gain.current, self.loss.current))
+
+
+
+class MACD(_Incremental):
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+        self.line = None
+
+
+    @classmethod
+    def from_series(klass, close, fast=12, slow=26, signal=9):
+        state = klass(fast, slow, signal)
+        close, state.scalar = klass._last(close)
+        state.size = close.shape[0]
+        state.fast = EMA.from_series(close, fast)
+        state.slow = EMA.from_series(close, slow)
+        line = _ewm(close, fast, state.fast.alpha) - _ewm(close, slow, state.slow.alpha)
+        state.signal = EMA.from_series(line, signal)
+        state.line = line[:, -1]
+        return state
+
+
+    def update(self, close):
+        if self.line is None:
+            self._setup(close)
+        self.line = self.fast.update(close) - self.slow.update(close)
+        self.signal.update(self.line)
+        self.line = numpy.asarray(self.line).reshape(-1)
+        return self.value
+
+
+    @property
+    def value(self):
+        """
+            (macd, signal, histogram)
+        """
+        signal = self.signal.current
+        return self._output(self.line), self._output(signal), self._output(self.line - signal)
+
+
+
+class Bollinger(_Incremental):
+    def __init__(self, n=20, k=2.0):
+        self.n = n
+        self.k = k
+        self.window = None
+
+
+    @classmethod
+    def from_series(klass, close, n=20, k=2.0):
+        state = klass(n, k)
+        state.window = _Window.from_series(close, n)
+        return state
+
+
+    def update(self, close):
+        if self.window is None:
+            self.window = _Window(self.n, close)
+        self.window.push(close)
+        return self.value
+
+
+    @property
+    def value(self):
+        """
+            (middle, upper, lower)
+        """
+        w = self.window
+        middle = numpy.where(w.count < self.n, numpy.nan, w.mean)
+        band = self.k * numpy.sqrt(numpy.clip(w.m2 / self.n, 0, None))
+        return w._output(middle), w._output(middle + band), w._output(middle - band)
+
+
+
+class ATR(_Incremental):
+    def __init__(self, n=14):
+        self.n = n
+        self.previous = None
+        self.range = EMA(n, 1.0 / n)
+
+
+    @classmethod
+    def from_series(klass, high, low, close, n=14):
+        state = klass(n)
+        close, state.scalar = klass._last(close)
+        state.size = close.shape[0]
+        high, _ = _rows(high)
+        low, _ = _rows(low)
+        state.range = EMA.from_series(_true_range(high, low, _shift(close)), n, 1.0 / n)
+        state.previous = close[:, -1]
+        return state
+
+
+    def update(self, high, low, close):
+        if self.previous is None:
+            close = self._setup(close)
+            self.previous = numpy.full(self.size, numpy.nan)
+        else:
+            close = self._input(close)
+
+        self.range.update(_true_range(self._input(high), self._input(low), self.previous))
+        self.previous = numpy.where(numpy.isnan(close), self.previous, close)
+        return self.value
+
+
+    @property
+    def value(self):
+        if self.range.current is None:
+            return numpy.nan
+        return self._output(self.range.current)
+
+
+
+class VWAP(_Incremental):
+    def __init__(self):
+        self.weighted = None
+
+
+    @classmethod
+    def from_series(klass, high, low, close, volume, reset=None):
+        state = klass()
+        close, state.scalar = klass._last(close)
+        state.size = close.shape[0]
+        high, _ = _rows(high)
+        low, _ = _rows(low)
+        volume, _ = _rows(volume)
+        if reset is not None:
+            reset = numpy.broadcast_to(numpy.asarray(reset, dtype=bool), close.shape)
+
+        valid = ~numpy.isnan(close)
+        weighted = numpy.where(valid, (high + low + close) / 3.0 * volume, 0.0)
+        state.weighted = _grouped_cumsum(weighted, reset)[:, -1]
+        state.volume = _grouped_cumsum(numpy.where(valid, volume, 0.0), reset)[:, -1]
+        return state
+
+
+    def update(self, high, low, close, volume, reset=False):
+        """
+            reset=True starts a new session with this bar
+        """
+        if self.weighted is None:
+            close = self._setup(close)
+            self.weighted = numpy.zeros(self.size)
+            self.volume = numpy.zeros(self.size)
+        else:
+            close = self._input(close)
+
+        volume = self._input(volume)
+        ok = ~numpy.isnan(close)
+        reset = numpy.asarray(reset, dtype=bool).reshape(-1) & ok
+        self.weighted = numpy.where(reset, 0.0, self.weighted)
+        self.volume = numpy.where(reset, 0.0, self.volume)
+
+        typical = (self._input(high) + self._input(low) + close) / 3.0
+        self.weighted = numpy.where(ok, self.weighted + typical * volume, self.weighted)
+        self.volume = numpy.where(ok, self.volume + volume, self.volume)
+        return self.value
+
+
+    @property
+    def value(self):
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            return self._output(self.weighted / self.volume)
+
+
+
+class _Window(_Incremental):
+    """
+        Last n values per symbol in a ring buffer, with their running mean
+        and sum of squared deviations (Welford, with the oldest value
+        swapped out once the window is full).
+    """
+
+    def __init__(self, n, x=None):
+        self.n = n
+        if x is not None:
+            self._setup(x)
+            self.buffer = numpy.full((n, self.size), numpy.nan)
+            self.position = numpy.zeros(self.size, dtype=int)
+            self.count = numpy.zeros(self.size, dtype=int)
+            self.mean = numpy.zeros(self.size)
+            self.m2 = numpy.zeros(self.size)
+
+
+    @classmethod
+    def from_series(klass, x, n):
+        window = klass(n)
+        x, window.scalar = klass._last(x)
+        window.size = x.shape[0]
+
+        # oldest first, so any padding is what gets overwritten next
+        buffer = numpy.full((window.size, n), numpy.nan)
+        tail = x[:, -n:]
+        buffer[:, n - tail.shape[-1]:] = tail
+        window.buffer = buffer.T.copy()
+        window.position = numpy.zeros(window.size, dtype=int)
+        window.count = (~numpy.isnan(buffer)).sum(axis=-1)
+
+        with numpy.errstate(invalid='ignore'):
+            mean = numpy.nanmean(buffer, axis=-1) if window.size else numpy.zeros(0)
+        window.mean = numpy.nan_to_num(mean)
+        window.m2 = numpy.nansum((buffer - window.mean[:, None]) ** 2, axis=-1)
+        return window
+
+
+    def push(self, x):
+        x = self._input(x)
+        ok = ~numpy.isnan(x)
+        rows = numpy.arange(self.size)
+
+        full = self.count >= self.n
+        oldest = self.buffer[self.position, rows]
+        self.buffer[self.position, rows] = numpy.where(ok, x, oldest)
+        self.position = numpy.where(ok, (self.position + 1) % self.n, self.position)
+
+        adding = ok & ~full
+        swapping = ok & full
+        self.count = self.count + adding
+
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            added = self.mean + (x - self.mean) / self.count
+            swapped = self.mean + (x - oldest) / self.n
+            m2_added = self.m2 + (x - self.mean) * (x - added)
+            m2_swapped = self.m2 + (x - oldest) * (x - swapped + oldest - self.mean)
+
+        self.mean = numpy.where(adding, added, numpy.where(swapping, swapped, self.mean))
+        self.m2 = numpy.where(adding, m2_added, numpy.where(swapping, m2_swapped, self.m2))
@@ -1,48 +1,99 @@
 #!/usr/bin/env python
 
 import logging
-from datetime import datetime
+from collections import OrderedDict
 
 from pyameritrade.utils import pp
 from pyameritrade.properties import QuoteProperty, PHMethod
 
 import ujson
-import pandas
 
-from plotly import tools
-import plotly.plotly as py
-import plotly
-import plotly.graph_objs as go
+# numpy and pandas are only imported once candles are actually built,
+# so clients that never touch a PriceHistory don't pay for them
+
+
+
+# column name -> dtype of each candle field, in frame order
+CANDLE_COLUMNS = (('open',   'float64'),
+                  ('high',   'float64'),
+                  ('low',    'float64'),
+                  ('close',  'float64'),
+                  ('volume', 'int64'),
+                 )
+
+
+def candle_frame(candles):
+    """
+        Decode the raw candle list straight into typed columns.
+
+        'datetime' (epoch ms) is converted once into a tz-aware UTC
+        DatetimeIndex instead of walking every row.
+    """
+    import numpy
+    import pandas
+
+    count = len(candles)
+    columns = dict()
+    for name, dtype in CANDLE_COLUMNS:
+        columns[name] = numpy.fromiter((c[name] for c in candles), dtype=dtype, count=count)
+
+    epoch_ms = numpy.fromiter((c['datetime'] for c in candles), dtype=numpy.int64, count=count)
+    index = pandas.DatetimeIndex(pandas.to_datetime(epoch_ms, unit='ms', utc=True), name='datetime')
+
+    return pandas.DataFrame(columns, index=index)
 
 
 
 class AmeritradeItem():
     logger = logging.getLogger('pyameritrade.Item')
 
+    # Fields are not copied onto the item.  They are read lazily out of
+    # the parsed payload by __getattr__, so an item is just two references.
+    # Subclasses that need extra per-instance state declare their own
+    # __slots__, or leave them off to get a __dict__.
+    __slots__ = ('json', 'client')
+
     def __init__(self, json, client):
         self.json = json
         self.client = client
 
+
+    def __getattr__(self, name):
+        # only called when normal lookup fails
+        if name.startswith('__') or name in AmeritradeItem.__slots__:
+            raise AttributeError(name)
+
+        #cant begin a variable/attr with a number.
+        # ie 52WkHigh is read as _52WkHigh
+        key = name[1:] if name[:1] == '_' and name[1:2].isdigit() else name
+        try:
+            return self.json[key]
+        except (KeyError, TypeError):
+            raise AttributeError("'%s' object has no attribute '%s'" % (self.__class__.__name__, name))
+
+
+    def fields(self):
         for k, v in self.json.items():
-            #cant begin a variable/attr with a number.
-            # ie 52WkHigh
-            if isinstance(k, str) and k[0].isdigit():
+            if isinstance(k, str) and k[:1].isdigit():
                 k = '_'+k
-            setattr(self, k, v)
+            yield k, v
+
+
+    def __dir__(self):
+        return sorted(set(object.__dir__(self)) | set(k for k, _ in self.fields()))
 
 
     def __repr__(self):
-        attrs = dict()
-        for k, v in self.__dict__.items():
-            #Do we want to show None/empty values?
-            #if not v or k in ('json', 'client'): continue
-            if k in ('json', 'client'): continue
-            attrs[k] = v
+        attrs = dict(self.fields())
+        #Do we want to show None/empty values?
+        attrs.update(getattr(self, '__dict__', {}))
         return pp.pformat(attrs)
 
 
 
 class Describe():
+    __slots__ = ()
+
     def __repr__(self):
         return '     [  '+ self.__class__.__name__ +'  ]\n' + AmeritradeItem.__repr__(self)
 
@@ -57,6 +108,7 @@ class Token(AmeritradeItem, Describe):
 
 class Quote(AmeritradeItem, PHMethod, Describe):
     logger = logging.getLogger('pyameritrade.Quote')
+    __slots__ = ('_price_history',)
 
     def __init__(self, symbol, json, client):
         AmeritradeItem.__init__(self, json, client)
@@ -64,6 +116,7 @@ class Quote(AmeritradeItem, PHMethod, Describe):
 
 class Instrument(AmeritradeItem, QuoteProperty, PHMethod, Describe):
     logger = logging.getLogger('pyameritrade.Instrument')
+    __slots__ = ('_price_history',)
 
     def __init__(self, json, client):
         AmeritradeItem.__init__(self, json, client)
@@ -83,6 +136,7 @@ class Account(AmeritradeItem, Describe):
 
 class Mover(AmeritradeItem, QuoteProperty, PHMethod, Describe):
     logger = logging.getLogger('pyameritrade.Mover')
+    __slots__ = ('_price_history',)
 
     def __init__(self, json, client):
         AmeritradeItem.__init__(self, json, client)
@@ -93,11 +147,94 @@ class PriceHistory(AmeritradeItem):
 
     def __init__(self, json, client):
         AmeritradeItem.__init__(self, json, client)
+        self._candles = None
+
+    @property
+    def candles(self):
+        # built on first access
+        if self._candles is None:
+            self._candles = candle_frame(self.json['candles'])
+        return self._candles
 
-        self.candles = pandas.DataFrame(self.json['candles'])
-        for i, candle in self.candles.iterrows():
-            self.candles.at[i, 'datetime'] = datetime.utcfromtimestamp(candle['datetime']/1000.0)
+    @candles.setter
+    def candles(self, candles):
+        self._candles = candles
+
+    @classmethod
+    def from_candles(klass, symbol, candles, client):
+        """
+            Wrap an already built candle frame, ie. from the PriceHistoryStore
+        """
+        ph = klass({'symbol': symbol, 'empty': candles.empty, 'candles': []}, client)
+        ph.candles = candles
+        return ph
 
     def __repr__(self):
         return '     [  '+ self.__class__.__name__ +'  ]' + "     " + " Symbol: %s\nCandles:\n%s" % (self.symbol, self.candles)
 
+
+
+
+class ItemList(list):
+    """
+        List of items returned for a collection endpoint, with batch loading
+        for the per item lookups that would otherwise be one request each.
+
+            movers = client.get_movers('$SPX.X')
+            movers.prefetch_quotes()            # one request, not one per mover
+            for m in movers:
+                m.quote.lastPrice
+    """
+    logger = logging.getLogger('pyameritrade.ItemList')
+
+    def __init__(self, items=(), client=None):
+        list.__init__(self, items)
+        self.client = client
+
+
+    @property
+    def symbols(self):
+        """
+            Symbols of the items, in order and without duplicates
+        """
+        return [symbol for symbol in OrderedDict.fromkeys(getattr(item, 'symbol', None) for item in self) if symbol]
+
+
+    def prefetch_quotes(self, max_workers=8):
+        """
+            Quote every item in as few chunked requests as possible.  The
+            quotes land in the client's quote cache, which is what
+            item.quote reads, so they are served from there for the cache
+            ttl.  Returns the OrderedDict of symbol -> Quote.
+        """
+        return self.client.get_bulk_quotes(self.symbols, max_workers=max_workers)
+
+
+    def prefetch_price_history(self, max_workers=8, **kwargs):
+        """
+            Fetch price_history(**kwargs) for every item concurrently, so the
+            items' own price_history(**kwargs) calls return it without a
+            request.  A symbol that fails is logged and left to fetch on
+            its own.  Returns a dict of symbol -> PriceHistory.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        symbols = self.symbols
+        if not symbols:
+            return dict()
+
+        def fetch(symbol):
+            try:
+                return self.client.get_price_history(symbol, **kwargs)
+            except Exception as e:
+                self.logger.warning("Price history prefetch for %s failed: %s", symbol, e)
+                return None
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(symbols))) as executor:
+            histories = dict((s, ph) for s, ph in zip(symbols, executor.map(fetch, symbols)) if ph is not None)
+
+        for item in self:
+            ph = histories.get(getattr(item, 'symbol', None))
+            if ph is not None and isinstance(item, PHMethod):
+                item._price_history = (kwargs, ph)
+        return histories
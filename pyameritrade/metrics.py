@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+
+import logging
+import threading
+from collections import OrderedDict
+
+from pyameritrade.urls import URLs, ROUTES
+
+
+# seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def endpoint_name(url):
+    """
+        URLs member name for an API url, ie. 'QUOTES'
+    """
+    URL = ROUTES.resolve(url)
+    if URL is not None:
+        return URL.name
+    if url.endswith(URLs.AUTH_TOKEN.value):
+        return URLs.AUTH_TOKEN.name
+    return 'OTHER'
+
+
+
+class Histogram():
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+        yield '+Inf', self.count
+
+
+
+class EndpointStats():
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes = 0
+        self.network = Histogram()
+        self.decode = Histogram()
+        self.parse = Histogram()
+
+
+
+class Instrumentation():
+    """
+        Per endpoint counters and latency histograms, plus hooks.
+
+        Hooks are plain callables taking keyword arguments:
+
+            on_request(endpoint, method, url)
+            on_response(endpoint, method, url, status, bytes, network, decode, parse)
+            on_error(endpoint, method, url, error)
+
+        where the times are in seconds.  A hook that raises is logged and
+        otherwise ignored, it never fails the request.
+
+            @client.metrics.on_response
+            def slow(endpoint, network, **kwargs):
+                if network > 1: print(endpoint, network)
+    """
+    logger = logging.getLogger('pyameritrade.Instrumentation')
+
+    def __init__(self):
+        self.endpoints = OrderedDict()
+        self.token_refreshes = 0
+
+        self.request_hooks = list()
+        self.response_hooks = list()
+        self.error_hooks = list()
+
+        # name -> (help, callable), sampled when exported
+        self.gauges = OrderedDict()
+
+        self._lock = threading.Lock()
+
+
+    def on_request(self, hook):
+        self.request_hooks.append(hook)
+        return hook
+
+
+    def on_response(self, hook):
+        self.response_hooks.append(hook)
+        return hook
+
+
+    def on_error(self, hook):
+        self.error_hooks.append(hook)
+        return hook
+
+
+    def add_gauge(self, name, help, func):
+        self.gauges[name] = (help, func)
+
+
+    def _stats(self, endpoint):
+        stats = self.endpoints.get(endpoint)
+        if stats is None:
+            stats = self.endpoints.setdefault(endpoint, EndpointStats())
+        return stats
+
+
+    def _fire(self, hooks, **kwargs):
+        for hook in hooks:
+            try:
+                hook(**kwargs)
+            except Exception:
+                self.logger.exception("Instrumentation hook %r failed" % hook)
+
+
+    def request(self, endpoint, method, url):
+        with self._lock:
+            self._stats(endpoint).requests += 1
+        if self.request_hooks:
+            self._fire(self.request_hooks, endpoint=endpoint, method=method, url=url)
+
+
+    def response(self, endpoint, method, url, status, bytes, network, decode, parse):
+        with self._lock:
+            stats = self._stats(endpoint)
+            stats.bytes += bytes
+            stats.network.observe(network)
+            stats.decode.observe(decode)
+            stats.parse.observe(parse)
+        if self.response_hooks:
+            self._fire(self.response_hooks, endpoint=endpoint, method=method, url=url, status=status,
+                       bytes=bytes, network=network, decode=decode, parse=parse)
+
+
+    def error(self, endpoint, method, url, error):
+        with self._lock:
+            self._stats(endpoint).errors += 1
+        if self.error_hooks:
+            self._fire(self.error_hooks, endpoint=endpoint, method=method, url=url, error=error)
+
+
+    def retry(self, endpoint, count=1):
+        with self._lock:
+            self._stats(endpoint).retries += count
+
+
+    def token_refreshed(self):
+        with self._lock:
+            self.token_refreshes += 1
+
+
+    def to_prometheus(self, prefix='pyameritrade'):
+        """
+            Prometheus text exposition format
+        """
+        lines = list()
+
+        def metric(name, type_, help):
+            lines.append('# HELP %s_%s %s' % (prefix, name, help))
+            lines.append('# TYPE %s_%s %s' % (prefix, name, type_))
+
+        with self._lock:
+            endpoints = list(self.endpoints.items())
+
+            for name, attr, help in (('requests_total', 'requests', 'Requests sent'),
+                                     ('errors_total', 'errors', 'Failed requests'),
+                                     ('retries_total', 'retries', 'Requests sent again after a 401 or by the retry policy'),
+                                     ('response_bytes_total', 'bytes', 'Response body bytes')):
+                metric(name, 'counter', help)
+                for endpoint, stats in endpoints:
+                    lines.append('%s_%s{endpoint="%s"} %s' % (prefix, name, endpoint, getattr(stats, attr)))
+
+            for name, attr, help in (('network_seconds', 'network', 'Time on the wire, including any 401 retry'),
+                                     ('decode_seconds', 'decode', 'JSON decode time'),
+                                     ('parse_seconds', 'parse', 'Item construction time')):
+                metric(name, 'histogram', help)
+                for endpoint, stats in endpoints:
+                    histogram = getattr(stats, attr)
+                    for bound, count in histogram.cumulative():
+                        lines.append('%s_%s_bucket{endpoint="%s",le="%s"} %d' % (prefix, name, endpoint, bound, count))
+                    lines.append('%s_%s_sum{endpoint="%s"} %f' % (prefix, name, endpoint, histogram.sum))
+                    lines.append('%s_%s_count{endpoint="%s"} %d' % (prefix, name, endpoint, histogram.count))
+
+            metric('token_refreshes_total', 'counter', 'Access token refreshes')
+            lines.append('%s_token_refreshes_total %d' % (prefix, self.token_refreshes))
+
+        for name, (help, func) in self.gauges.items():
+            metric(name, 'gauge', help)
+            lines.append('%s_%s %s' % (prefix, name, func()))
+
+        return '\n'.join(lines) + '\n'
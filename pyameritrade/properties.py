@@ -2,31 +2,31 @@
 
 
 class QuoteProperty():
-    # TODO add an issue for caching
-    # SUPER simple caching mechanism
-    # if this was long livced at all it would
-    # get out of sync with the current price
-    #
-    _quote = None
+    __slots__ = ()
+
+    # Reads through the client's QuoteCache, so every item
+    # shares the same quotes and none outlive the cache ttl
     def getvalue(self):
-        if self._quote:return self._quote
-        quote = self.client.get_quotes(self.symbol)[0]
-        self._quote = quote
-        return quote
+        return self.client.get_quote(self.symbol)
     quote = property(getvalue)
 
 
 class PHMethod():
-    # SUPER simple caching mechanism
-    # if this was long livced at all it would
-    # get out of sync with the current price
-    #
+    # Keeps the last price history fetched for the item.
+    # Host classes provide a '_price_history' slot.
+    __slots__ = ()
 
     # method acting like a property
     #TODO This is confusing!!!
-    candles = None
     def price_history(self, **kwargs):
-        if self.candles:return self.candles
+        cached = getattr(self, '_price_history', None)
+        if cached and cached[0] == kwargs:
+            return cached[1]
         ph = self.client.get_price_history(self.symbol, **kwargs)
-        self.candles = ph.candles
+        self._price_history = (kwargs, ph)
         return ph
+
+    @property
+    def candles(self):
+        cached = getattr(self, '_price_history', None)
+        return cached[1].candles if cached else None
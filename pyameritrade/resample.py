@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+
+"""
+    Coarser bars built locally from finer ones, so one minute fetch can
+    serve every frequency in rest_api.VALID_FREQUENCY_TYPES.
+
+        bars = Resampler.fetch(client, 'AAPL', datetime(2020, 1, 1))
+        five = bars.bars('minute', 5)
+        daily = bars.bars('daily')
+        bars.refresh()              # pull new minute bars, update every view
+
+    Bars follow the exchange day in America/New_York: minute buckets are
+    counted from the 9:30 open (and from the 16:00 close after hours),
+    never straddle the open or the close, and daily and longer bars only
+    cover the regular session unless extended_hours is set.
+"""
+
+import logging
+from datetime import datetime
+
+import numpy
+import pandas
+
+from pyameritrade.items import PriceHistory
+from pyameritrade.rest_api import VALID_FREQUENCY_TYPES
+
+
+EXCHANGE_TZ = 'America/New_York'
+
+# minutes after midnight, exchange time
+SESSION_OPEN = 9 * 60 + 30
+SESSION_CLOSE = 16 * 60
+
+MINUTE_NS = 60 * 10**9
+DAY_NS = 24 * 60 * MINUTE_NS
+
+
+def aggregate(candles, starts, index):
+    """
+        One bar per run of candles beginning at each position in 'starts':
+        first open, highest high, lowest low, last close, total volume.
+    """
+    ends = numpy.append(starts[1:], len(candles)) - 1
+    columns = dict(open=candles['open'].values[starts],
+                   high=numpy.maximum.reduceat(candles['high'].values, starts),
+                   low=numpy.minimum.reduceat(candles['low'].values, starts),
+                   close=candles['close'].values[ends],
+                   volume=numpy.add.reduceat(candles['volume'].values, starts),
+                  )
+    return pandas.DataFrame(columns, index=index, columns=candles.columns)
+
+
+def is_intraday(index):
+    """
+        True for bars closer together than a day, which are filtered to
+        the session.  Daily and longer bars are taken as they are.
+    """
+    return len(index) > 1 and numpy.median(numpy.diff(index.as_unit('ns').asi8)) < DAY_NS
+
+
+def _buckets(index, frequency_type, frequency, extended_hours, intraday):
+    """
+        (positions, starts, labels): the positions of the rows that are
+        kept, the offsets into those where each bar starts and the UTC
+        label of each bar.
+    """
+    if frequency_type not in VALID_FREQUENCY_TYPES:
+        raise TypeError("Invalid frequncy_type '%s'. Must be in %s" % (frequency_type, VALID_FREQUENCY_TYPES.keys()))
+
+    unit = index.unit
+    index = index.as_unit('ns')
+    utc = index.asi8
+    wall = index.tz_convert(EXCHANGE_TZ).tz_localize(None).asi8
+    day = wall // DAY_NS * DAY_NS
+    minute = (wall - day) // MINUTE_NS
+
+    positions = numpy.arange(len(index))
+    if intraday and not extended_hours:
+        positions = numpy.nonzero((minute >= SESSION_OPEN) & (minute < SESSION_CLOSE))[0]
+        utc, wall, day, minute = utc[positions], wall[positions], day[positions], minute[positions]
+
+    if frequency_type == 'minute':
+        anchor = numpy.where(minute >= SESSION_CLOSE, SESSION_CLOSE, SESSION_OPEN)
+        keys = day + (anchor + (minute - anchor) // frequency * frequency) * MINUTE_NS
+    elif frequency_type == 'daily':
+        keys = day
+    elif frequency_type == 'weekly':
+        # 1970-01-01 was a Thursday, count back to Monday
+        keys = day - ((day // DAY_NS + 3) % 7) * DAY_NS
+    else:
+        keys = day.astype('datetime64[ns]').astype('datetime64[M]').astype('datetime64[ns]').astype('int64')
+
+    starts = numpy.flatnonzero(numpy.diff(keys, prepend=keys[:1] - 1)) if len(keys) else keys
+
+    if frequency_type == 'minute':
+        # exchange offset of the bar's first row, the session never
+        # crosses a daylight saving change
+        labels = pandas.DatetimeIndex(keys[starts] + (utc - wall)[starts], tz='UTC', name='datetime')
+    else:
+        labels = pandas.DatetimeIndex(keys[starts]).tz_localize(EXCHANGE_TZ).tz_convert('UTC').rename('datetime')
+    return positions, starts, labels.as_unit(unit)
+
+
+def resample(candles, frequency_type='minute', frequency=5, extended_hours=False, intraday=None):
+    """
+        Candle frame (as PriceHistory.candles) aggregated into coarser bars
+        labelled with their start time.
+    """
+    if intraday is None:
+        intraday = is_intraday(candles.index)
+    positions, starts, labels = _buckets(candles.index, frequency_type, frequency, extended_hours, intraday)
+    if not len(starts):
+        return candles.iloc[:0]
+    if len(positions) != len(candles):
+        candles = candles.iloc[positions]
+    return aggregate(candles, starts, labels)
+
+
+
+class Resampler():
+    """
+        Fine candles for one symbol and every coarser view of them built so
+        far.  update() takes newly arrived fine bars and only re-aggregates
+        from the start of each view's last bar, which may still have been
+        forming.
+    """
+    logger = logging.getLogger('pyameritrade.Resampler')
+
+    def __init__(self, candles, symbol=None, client=None, extended_hours=False):
+        self.candles = candles
+        self.symbol = symbol
+        self.client = client
+        self.extended_hours = extended_hours
+        self.intraday = is_intraday(candles.index) if len(candles) > 1 else True
+
+        # (frequency_type, frequency) -> (bars, start of each bar in self.candles)
+        self.views = dict()
+
+
+    @classmethod
+    def fetch(klass, client, symbol, start_date, end_date=None, extended_hours=False):
+        """
+            One minute bars for the span (naive UTC datetimes), fetched in
+            as many windows as the API needs.
+        """
+        results = client.iter_price_histories([symbol], start_date, end_date,
+                                              frequency_type='minute', frequency=1,
+                                              need_extended_hours_data=extended_hours)
+        for symbol, ph, error in results:
+            if error is not None:
+                raise error
+            return klass(ph.candles, ph.symbol, client, extended_hours)
+
+
+    def _build(self, candles, frequency_type, frequency):
+        positions, starts, labels = _buckets(candles.index, frequency_type, frequency,
+                                             self.extended_hours, self.intraday)
+        if not len(starts):
+            return candles.iloc[:0], numpy.zeros(0, dtype=int)
+        if len(positions) != len(candles):
+            candles = candles.iloc[positions]
+        return aggregate(candles, starts, labels), positions[starts]
+
+
+    def bars(self, frequency_type='minute', frequency=5):
+        key = (frequency_type, frequency)
+        if key not in self.views:
+            self.views[key] = self._build(self.candles, frequency_type, frequency)
+        return self.views[key][0]
+
+
+    def price_history(self, frequency_type='minute', frequency=5):
+        return PriceHistory.from_candles(self.symbol, self.bars(frequency_type, frequency), self.client)
+
+
+    def update(self, candles):
+        """
+            Merge newer fine bars, ie. the tail of a fresh fetch.  Stored
+            bars from the first new timestamp on are replaced.
+        """
+        if not len(candles):
+            return
+        candles = candles.sort_index()
+        cut = self.candles.index.searchsorted(candles.index[0])
+        self.candles = pandas.concat([self.candles.iloc[:cut], candles])
+
+        for key, (bars, starts) in self.views.items():
+            # everything from the bar holding the first replaced row on
+            i = max(numpy.searchsorted(starts, cut, side='right') - 1, 0)
+            begin = starts[i] if len(starts) else 0
+            tail, tail_starts = self._build(self.candles.iloc[begin:], *key)
+            self.views[key] = (pandas.concat([bars.iloc[:i], tail]),
+                               numpy.concatenate([starts[:i], tail_starts + begin]))
+
+
+    def refresh(self, end_date=None):
+        """
+            Fetch minute bars from the last stored one up to now, in as
+            many windows as the API needs, and update
+        """
+        start = self.candles.index[-1].tz_convert(None).to_pydatetime()
+        results = self.client.iter_price_histories([self.symbol], start, end_date,
+                                                   frequency_type='minute', frequency=1,
+                                                   need_extended_hours_data=self.extended_hours)
+        for symbol, ph, error in results:
+            if error is not None:
+                raise error
+            self.update(ph.candles)
@@ -1,19 +1,23 @@
 #!/usr/bin/env python
 
-import re
+import time
 import logging
 import ujson
 
-from pyameritrade.urls import URLs
+from pyameritrade.urls import URLs, ROUTES
 from pyameritrade.items import Token, Quote, Instrument,\
-                               Account, PriceHistory, Mover
+                               Account, PriceHistory, Mover, ItemList
 
+from pyameritrade.stream import iter_members
 from pyameritrade.exception import RequestError
 from pyameritrade.utils import pp
 
 class Response():
     logger = logging.getLogger('pyameritrade.Response')
 
+    # URL -> parser(data, client), see register()
+    parsers = dict()
+
     def __init__(self, url, raw_response, client):
         self.url = url
         self.raw_response = raw_response
@@ -23,60 +27,187 @@ class Response():
         self.headers = raw_response.headers
 
         self.error = None
+        self.decode_time = 0.0
+        self.parse_time = 0.0
         if not self.raw_response.ok:
             raise RequestError(url=self.url, request=self.raw_response.request, response=self.raw_response)
 
         # Actually 'text/html;charset=UTF-8'
             # should we take the encoding into account?
         if self.raw_response.headers['Content-Type'].startswith('application/json'):
+            start = time.perf_counter()
             data = ujson.loads(self.raw_response.content)
+            self.decode_time = time.perf_counter() - start
         else:
             raise TypeError("Not Configured to handle %s" % self.raw_response.headers['Content-Type'])
 
+        start = time.perf_counter()
         self.items = self.parse(url, data, client)
+        self.parse_time = time.perf_counter() - start
+
+
+    @classmethod
+    def register(klass, URL, parser=None):
+        """
+            Register the parser for an endpoint.  'URL' is a URLs member or
+            any url template using '%s' for path parameters.  Usable as a
+            decorator:
+
+                @Response.register(URLs.GET_MOVERS)
+                def parse_movers(data, client):
+                    ...
+        """
+        def wrap(parser):
+            if URL not in ROUTES:
+                ROUTES.add(URL, URL.value if isinstance(URL, URLs) else URL)
+            klass.parsers[URL] = parser
+            return parser
+        return wrap(parser) if parser else wrap
 
 
     def parse(self, url, data, client):
-        # check url to see which type of response we are expecting,
-        # hence which type of items to return
-        if URLs.match(URLs.TOKEN, url):
+        # the token server url depends on the client's redirect_url
+        # so it can't live in the routing table
+        if client.redirect_url + URLs.AUTH_TOKEN.value == url:
             return Token(data, client)
 
-        elif self.client.redirect_url + URLs.AUTH_TOKEN.value == url:
-            return Token(data, client)
+        URL = ROUTES.resolve(url)
+        parser = self.parsers.get(URL)
+        if parser is None:
+            self.logger.warning("No parser registered for %s" % url)
+            return None
+        return parser(data, client)
+
+
+
+
+class StreamingResponse():
+    """
+        Opt-in incremental parsing of large responses, see Client.get(stream=True).
+
+        The body is read in chunks and split into top level members as it
+        arrives, and each member is turned into its item and yielded on its
+        own, so peak memory stays flat no matter how big the result is.
+    """
+    logger = logging.getLogger('pyameritrade.StreamingResponse')
+
+    # URL -> factory(key, value, client) returning an iterable of items
+    factories = dict()
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, url, raw_response, client):
+        self.url = url
+        self.raw_response = raw_response
+        self.client = client
+        self.headers = raw_response.headers
+
+        if not self.raw_response.ok:
+            raise RequestError(url=self.url, request=self.raw_response.request, response=self.raw_response)
+
+        if not self.raw_response.headers['Content-Type'].startswith('application/json'):
+            self.raw_response.close()
+            raise TypeError("Not Configured to handle %s" % self.raw_response.headers['Content-Type'])
+
+        self.factory = self.factories.get(ROUTES.resolve(url))
+        if self.factory is None:
+            self.raw_response.close()
+            raise TypeError("Streaming is not supported for %s" % url)
+
+
+    @classmethod
+    def register(klass, URL, factory=None):
+        def wrap(factory):
+            klass.factories[URL] = factory
+            return factory
+        return wrap(factory) if factory else wrap
+
+
+    def __iter__(self):
+        try:
+            for key, value in iter_members(self.raw_response.iter_content(self.chunk_size)):
+                for item in self.factory(key, value, self.client):
+                    yield item
+        finally:
+            self.raw_response.close()
+
+
+
+@StreamingResponse.register(URLs.QUOTES)
+def stream_quote(symbol, quote_json, client):
+    quote = Quote(symbol, quote_json, client)
+    client.quote_cache.put(quote)
+    yield quote
+
+
+@StreamingResponse.register(URLs.SEARCH_INSTRUMENTS)
+def stream_instrument(symbol, instrument_json, client):
+    yield Instrument(instrument_json, client)
+
+
+@StreamingResponse.register(URLs.GET_LINKED_ACCOUNTS)
+def stream_account(_, all_accounts_json, client):
+    for account_type, account_json in all_accounts_json.items():
+        yield Account(account_type, account_json, client)
+
+
+@StreamingResponse.register(URLs.GET_MOVERS)
+def stream_mover(_, mover_json, client):
+    yield Mover(mover_json, client)
+
+
+
+@Response.register(URLs.TOKEN)
+def parse_token(data, client):
+    return Token(data, client)
+
+
+@Response.register(URLs.QUOTES)
+def parse_quotes(data, client):
+    quotes = ItemList(client=client)
+    for symbol, quote_json in data.items():
+        quotes.append(Quote(symbol, quote_json, client))
+    client.quote_cache.update(quotes)
+    return quotes
+
+
+@Response.register(URLs.GET_INSTRUMENT)
+def parse_instrument(data, client):
+    #Assuming it's safe to just grab the first item...
+    return Instrument(next(iter(data)), client)
+
+
+@Response.register(URLs.SEARCH_INSTRUMENTS)
+def parse_instruments(data, client):
+    instruments = ItemList(client=client)
+    for symbol, instrument_json in data.items():
+        instruments.append(Instrument(instrument_json, client))
+    return instruments
+
+
+@Response.register(URLs.GET_ACCOUNT)
+def parse_account(data, client):
+    account_type = next(iter(data))
+    return Account(account_type, data[account_type], client)
+
+
+@Response.register(URLs.GET_LINKED_ACCOUNTS)
+def parse_linked_accounts(data, client):
+    accounts = ItemList(client=client)
+    for all_accounts_json in data:
+        for account_type, account_json in all_accounts_json.items():
+            accounts.append(Account(account_type, account_json, client))
+    return accounts
+
+
+@Response.register(URLs.PRICE_HISTORY)
+def parse_price_history(data, client):
+    return PriceHistory(data, client)
+
 
-        elif URLs.match(URLs.QUOTES, url):
-            quotes = list()
-            for symbol, quote_json in data.items():
-                quotes.append(Quote(symbol, quote_json, client))
-            return quotes
-
-        elif URLs.match(URLs.GET_INSTRUMENT, url):
-            #Assuming it's safe to just grab the first item...
-            return Instrument(next(iter(data)), client)
-
-        elif URLs.match(URLs.SEARCH_INSTRUMENTS, url):
-            instruments = list()
-            for symbol, instrument_json in data.items():
-                instruments.append(Instrument(instrument_json, client))
-            return instruments
-
-        elif URLs.match(URLs.GET_ACCOUNT, url):
-            account_type = next(iter(data))
-            return Account(account_type, data[account_type], client)
-
-        elif URLs.match(URLs.GET_LINKED_ACCOUNTS, url):
-            accounts = list()
-            for all_accounts_json in data:
-                for account_type, account_json in all_accounts_json.items():
-                    accounts.append(Account(account_type, account_json, client))
-            return accounts
-
-        elif URLs.match(URLs.PRICE_HISTORY, url):
-            return PriceHistory(data, client)
-
-        elif URLs.match(URLs.GET_MOVERS, url):
-            movers = list()
-            for mover_json in data:
-                movers.append(Mover(mover_json, client))
-            return movers
+@Response.register(URLs.GET_MOVERS)
+def parse_movers(data, client):
+    movers = ItemList(client=client)
+    for mover_json in data:
+        movers.append(Mover(mover_json, client))
+    return movers
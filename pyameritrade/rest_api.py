@@ -1,7 +1,9 @@
 #!/usr/bin/env python
 
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from pyameritrade.urls import URLs
 
@@ -17,11 +19,67 @@ VALID_PERIOD_TYPES = {'day':   (1,2,3,4,5,10),
 VALID_FREQUENCY_TYPES = {'minute':  (('day',),                 (1,5,10,15,30)),
                          'daily':   (('month', 'year', 'ytd'), (1,)),
                          'weekly':  (('month', 'year', 'ytd'), (1,)),
-                         'monthly': (('monthly'),              (1,))
+                         'monthly': (('year',),                (1,))
                         }
 
+# period_type to send with a start_date/end_date span, it
+# still decides which frequency_types the server accepts
+SPAN_PERIOD_TYPES = {'minute':  'day',
+                     'daily':   'year',
+                     'weekly':  'year',
+                     'monthly': 'year',
+                    }
+
+# Longest span the server returns in one request, longer
+# spans are split.  Other frequency_types are not limited.
+PRICE_HISTORY_WINDOWS = {'minute': timedelta(days=10)}
+
 VALID_INDICIES = ('$COMPX', '$DJI', '$SPX.X')
 
+# Keep each comma-joined quote request well inside the
+# URL length and response size limits of the server
+QUOTE_CHUNK_SIZE = 300
+QUOTE_CHUNK_CHARS = 1800
+
+
+def unique_symbols(symbols):
+    """
+        Upper cased symbols without blanks or duplicates, first occurrence wins
+    """
+    return [s for s in OrderedDict.fromkeys(s.strip().upper() for s in symbols) if s]
+
+
+def chunk_symbols(symbols, size=QUOTE_CHUNK_SIZE, max_chars=QUOTE_CHUNK_CHARS):
+    """
+        Split an iterable of symbols into lists of at most 'size' symbols
+        whose comma-joined length stays under 'max_chars'.  Duplicates are
+        dropped, first occurrence wins.
+    """
+    chunk, chars = list(), 0
+    for symbol in unique_symbols(symbols):
+        if chunk and (len(chunk) == size or chars + len(symbol) + 1 > max_chars):
+            yield chunk
+            chunk, chars = list(), 0
+        chunk.append(symbol)
+        chars += len(symbol) + 1
+    if chunk:
+        yield chunk
+
+
+def split_span(start_date, end_date, window):
+    """
+        (start, end) windows of at most 'window' covering the span,
+        or the whole span if window is None
+    """
+    if window is None or end_date - start_date <= window:
+        return [(start_date, end_date)]
+    spans = list()
+    while start_date < end_date:
+        spans.append((start_date, min(start_date + window, end_date)))
+        start_date += window
+    return spans
+
+
 class RestAPI():
     logger = logging.getLogger('pyameritrade.RestAPI')
 
@@ -44,7 +102,7 @@ class RestAPI():
         headers = {'Content-Type':'application/x-www-form-urlencoded'}
 
         refresh_token = self.post(URLs.TOKEN.value, params, headers)
-        self.session.headers.update({'Authorization':'Bearer %s' % refresh_token.access_token})
+        self.set_access_token(refresh_token)
         return refresh_token
 
 
@@ -68,12 +126,48 @@ class RestAPI():
     #### Quotes
     ############################################################
 
-    def get_quotes(self, symbol):
+    def get_quotes(self, symbol, stream=False):
         """
             https://developer.tdameritrade.com/quotes/apis/get/marketdata/quotes
         """
 
-        return self.get(URLs.QUOTES.value, {'symbol':symbol.upper()})
+        return self.get(URLs.QUOTES.value, {'symbol':symbol.upper()}, stream=stream)
+
+
+    def get_quote(self, symbol):
+        """
+            Single quote, read through the client's quote cache
+        """
+        quote = self.quote_cache.get(symbol)
+        if quote is None:
+            quote = self.get_quotes(symbol)[0]
+        return quote
+
+
+    def get_bulk_quotes(self, symbols, chunk_size=QUOTE_CHUNK_SIZE, max_workers=8):
+        """
+            Quote any number of symbols.  The symbols are split into chunks
+            that fit in a single request, the chunks are fetched concurrently
+            and the results merged into one OrderedDict of symbol -> Quote,
+            in chunk order then response order.
+        """
+        chunks = [','.join(chunk) for chunk in chunk_symbols(symbols, chunk_size)]
+        if not chunks:
+            return OrderedDict()
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            results = list(executor.map(self.get_quotes, chunks))
+
+        return self._merge_quotes(results)
+
+
+    @staticmethod
+    def _merge_quotes(results):
+        quotes = OrderedDict()
+        for chunk_quotes in results:
+            for quote in chunk_quotes:
+                quotes[quote.symbol] = quote
+        return quotes
 
     ###########################################################
     #### Price History
@@ -145,6 +239,113 @@ class RestAPI():
 
         return self.get(URLs.PRICE_HISTORY.value % symbol.upper(), params=params)
 
+    def iter_price_histories(self, symbols, start_date, end_date=None, frequency_type='daily', frequency=1,
+                             need_extended_hours_data=True, window=None, max_workers=8):
+        """
+            Price history of many symbols over one start/end span (naive
+            UTC datetimes, end defaults to now).
+
+            Spans longer than PRICE_HISTORY_WINDOWS allows for the
+            frequency_type, or than 'window', are split into several
+            requests.  Requests run concurrently on a thread pool and go
+            through the client's rate limiter like any other.
+
+            Yields (symbol, PriceHistory, None) as each symbol completes,
+            or (symbol, None, exception) for a symbol that failed.
+        """
+        end_date = end_date or datetime.utcnow()
+        window = window or PRICE_HISTORY_WINDOWS.get(frequency_type)
+        spans = split_span(start_date, end_date, window)
+        symbols = unique_symbols(symbols)
+
+        kwargs = dict(period_type=SPAN_PERIOD_TYPES.get(frequency_type),
+                      frequency_type=frequency_type,
+                      frequency=frequency,
+                      need_extended_hours_data=need_extended_hours_data)
+
+        pending = dict((symbol, len(spans)) for symbol in symbols)
+        frames = dict((symbol, list()) for symbol in symbols)
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = dict()
+            for symbol in symbols:
+                for span_start, span_end in spans:
+                    future = executor.submit(self.get_price_history, symbol,
+                                             start_date=span_start, end_date=span_end, **kwargs)
+                    futures[future] = symbol
+
+            for future in as_completed(futures):
+                symbol = futures[future]
+                if symbol not in pending:
+                    # already reported as failed
+                    continue
+
+                try:
+                    frames[symbol].append(future.result().candles)
+                except Exception as e:
+                    self.logger.warning("Price history for %s failed: %s", symbol, e)
+                    del pending[symbol]
+                    yield symbol, None, e
+                    continue
+
+                pending[symbol] -= 1
+                if not pending[symbol]:
+                    del pending[symbol]
+                    yield symbol, self._join_candles(symbol, frames.pop(symbol)), None
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+    def _join_candles(self, symbol, frames):
+        from pyameritrade.items import PriceHistory
+
+        candles = frames[0]
+        if len(frames) > 1:
+            import pandas
+            candles = pandas.concat(frames)
+            # windows share their boundary bar
+            candles = candles[~candles.index.duplicated(keep='last')].sort_index()
+        return PriceHistory.from_candles(symbol, candles, self)
+
+
+    def get_price_histories(self, symbols, start_date, end_date=None, frequency_type='daily', frequency=1,
+                            need_extended_hours_data=True, window=None, max_workers=8, align=False):
+        """
+            All of iter_price_histories in one panel DataFrame indexed by
+            (symbol, datetime), in the order the symbols were given.  With
+            align=True every symbol gets a row for every datetime seen, NaN
+            where it had no bar.
+
+            Returns (panel, failures) where failures maps symbol -> exception.
+        """
+        import pandas
+        from pyameritrade.items import CANDLE_COLUMNS
+
+        histories = dict()
+        failures = OrderedDict()
+        for symbol, ph, error in self.iter_price_histories(symbols, start_date, end_date,
+                                                           frequency_type=frequency_type,
+                                                           frequency=frequency,
+                                                           need_extended_hours_data=need_extended_hours_data,
+                                                           window=window,
+                                                           max_workers=max_workers):
+            if error is None:
+                histories[symbol] = ph.candles
+            else:
+                failures[symbol] = error
+
+        order = [s for s in unique_symbols(symbols) if s in histories]
+        if not order:
+            index = pandas.MultiIndex.from_arrays([[], pandas.DatetimeIndex([], tz='UTC')], names=['symbol', 'datetime'])
+            return pandas.DataFrame(columns=[name for name, _ in CANDLE_COLUMNS], index=index), failures
+
+        panel = pandas.concat([histories[s] for s in order], keys=order, names=['symbol', 'datetime'])
+        if align:
+            times = panel.index.get_level_values('datetime').unique().sort_values()
+            panel = panel.reindex(pandas.MultiIndex.from_product([order, times], names=['symbol', 'datetime']))
+        return panel, failures
+
     ############################################################
     #### Instruments
     ############################################################
@@ -156,11 +357,11 @@ class RestAPI():
         return self.get(URLs.GET_INSTRUMENT.value % cusip)
 
 
-    def search_instruments(self, symbol, projection):
+    def search_instruments(self, symbol, projection, stream=False):
         """
             https://developer.tdameritrade.com/instruments/apis/get/instruments
         """
-        return self.get(URLs.SEARCH_INSTRUMENTS.value, {'symbol':symbol, 'projection':projection})
+        return self.get(URLs.SEARCH_INSTRUMENTS.value, {'symbol':symbol, 'projection':projection}, stream=stream)
 
 
     ############################################################
@@ -177,13 +378,13 @@ class RestAPI():
         return self.get(URLs.GET_ACCOUNT.value % account_id, fields)
 
 
-    def get_linked_accounts(self, fields=None):
+    def get_linked_accounts(self, fields=None, stream=False):
         """
             https://developer.tdameritrade.com/account-access/apis/get/accounts-0
         """
         fields = {'fields': fields} if fields else None
 
-        return self.get(URLs.GET_LINKED_ACCOUNTS.value, fields)
+        return self.get(URLs.GET_LINKED_ACCOUNTS.value, fields, stream=stream)
 
     ############################################################
     #### Movers
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+
+import os
+import logging
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+import numpy
+import pandas
+import ujson
+
+from pyameritrade.items import PriceHistory, CANDLE_COLUMNS
+from pyameritrade.rest_api import EPOCH, SPAN_PERIOD_TYPES, PRICE_HISTORY_WINDOWS, split_span
+
+
+class PriceHistoryStore():
+    """
+        Local candle store keyed by symbol, frequency_type and frequency.
+
+        Each key is a directory holding one .npy file per column, which is
+        memory mapped on load, plus a small meta.json recording the span
+        that has already been fetched from the API.  A request is served
+        from disk and only the missing head and/or tail of the span is
+        fetched, in PRICE_HISTORY_WINDOWS sized requests, then merged back
+        into the store.
+
+            store = PriceHistoryStore('~/.pyameritrade/history', client)
+            ph = store.get_price_history('AAPL', datetime(2000, 1, 1))
+    """
+    logger = logging.getLogger('pyameritrade.PriceHistoryStore')
+
+    def __init__(self, root, client):
+        self.root = os.path.expanduser(root)
+        self.client = client
+
+
+    def _path(self, symbol, frequency_type, frequency):
+        return os.path.join(self.root, quote(symbol.upper(), safe=''), '%s_%s' % (frequency_type, frequency))
+
+
+    def load(self, symbol, frequency_type='daily', frequency=1):
+        """
+            Returns (candles, meta) for the key, or (None, None) if nothing
+            has been stored yet.
+        """
+        path = self._path(symbol, frequency_type, frequency)
+        meta_path = os.path.join(path, 'meta.json')
+        if not os.path.exists(meta_path):
+            return None, None
+
+        with open(meta_path, 'r') as fo:
+            meta = ujson.load(fo)
+
+        columns = dict()
+        for name, _ in CANDLE_COLUMNS:
+            columns[name] = numpy.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+
+        epoch_ms = numpy.load(os.path.join(path, 'datetime.npy'), mmap_mode='r')
+        index = pandas.DatetimeIndex(pandas.to_datetime(epoch_ms, unit='ms', utc=True), name='datetime')
+
+        return pandas.DataFrame(columns, index=index, copy=False), meta
+
+
+    def save(self, symbol, frequency_type, frequency, candles, meta):
+        path = self._path(symbol, frequency_type, frequency)
+        os.makedirs(path, exist_ok=True)
+
+        arrays = {'datetime': candles.index.as_unit('ms').asi8}
+        for name, dtype in CANDLE_COLUMNS:
+            arrays[name] = candles[name].to_numpy(dtype=dtype)
+
+        # write everything aside first so a crash never leaves
+        # a meta.json describing columns that were not written
+        for name, array in arrays.items():
+            tmp = os.path.join(path, name + '.tmp.npy')
+            numpy.save(tmp, array)
+            os.replace(tmp, os.path.join(path, name + '.npy'))
+
+        tmp = os.path.join(path, 'meta.tmp')
+        with open(tmp, 'w') as fo:
+            ujson.dump(meta, fo)
+        os.replace(tmp, os.path.join(path, 'meta.json'))
+
+
+    def get_price_history(self, symbol, start_date, end_date=None, frequency_type='daily', frequency=1,
+                          need_extended_hours_data=True):
+        """
+            Same candles as RestAPI.get_price_history for a start/end span
+            (naive UTC datetimes, end defaults to now), but only the parts
+            not already on disk are requested.
+        """
+        end_date = end_date or datetime.utcnow()
+        start, end = _to_ms(start_date), _to_ms(end_date)
+
+        candles, meta = self.load(symbol, frequency_type, frequency)
+
+        # (start, end, backwards), a head gap is fetched from its end back
+        # so the stored span only ever grows by windows that came back
+        gaps = list()
+        if candles is None:
+            gaps.append((start_date, end_date, False))
+            meta = {'start': start, 'end': start}
+        else:
+            if start < meta['start']:
+                gaps.append((start_date, _from_ms(meta['start']), True))
+            if end > meta['end']:
+                # the last stored bar may have still been forming, fetch it again
+                tail = meta['end']
+                if not candles.empty:
+                    tail = min(tail, int(candles.index[-1].value // 10**6))
+                gaps.append((_from_ms(tail), end_date, False))
+
+        window = PRICE_HISTORY_WINDOWS.get(frequency_type)
+        frames = [candles] if candles is not None else []
+        try:
+            for gap_start, gap_end, backwards in gaps:
+                spans = split_span(gap_start, gap_end, window)
+                for span_start, span_end in (reversed(spans) if backwards else spans):
+                    self.logger.info("Fetching %s %s/%s %s -> %s" % (symbol, frequency_type, frequency,
+                                                                     span_start, span_end))
+                    ph = self.client.get_price_history(symbol,
+                                                       period_type=SPAN_PERIOD_TYPES.get(frequency_type),
+                                                       frequency_type=frequency_type,
+                                                       frequency=frequency,
+                                                       start_date=span_start,
+                                                       end_date=span_end,
+                                                       need_extended_hours_data=need_extended_hours_data)
+                    frames.append(ph.candles)
+                    meta = {'start': min(_to_ms(span_start), meta['start']),
+                            'end': max(_to_ms(span_end), meta['end'])}
+        finally:
+            # keep whatever was fetched before a failed window
+            if len(frames) > (candles is not None):
+                candles = pandas.concat(frames)
+                candles = candles[~candles.index.duplicated(keep='last')].sort_index()
+                self.save(symbol, frequency_type, frequency, candles, meta)
+
+        span = candles.loc[pandas.Timestamp(start, unit='ms', tz='UTC'):pandas.Timestamp(end, unit='ms', tz='UTC')]
+        return PriceHistory.from_candles(symbol.upper(), span, self.client)
+
+
+
+def _to_ms(dt):
+    return int((dt-EPOCH).total_seconds()*1000.0)
+
+
+def _from_ms(ms):
+    return EPOCH + timedelta(milliseconds=ms)
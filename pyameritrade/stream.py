@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+import re
+import json
+import codecs
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# what may be left of a number cut by the end of the buffer, ie. '-1500.'
+_NUMBER_TAIL = re.compile(r'[.eE+\-]*\Z')
+
+
+class _Incomplete(Exception):
+    pass
+
+
+def iter_members(chunks):
+    """
+        Incrementally split a JSON document arriving in byte chunks into its
+        top level members, without ever holding more than one member (plus
+        the current chunk) in memory.
+
+        Yields (key, value) for each member of a top level object, or
+        (None, value) for each element of a top level array.
+
+        Each member is decoded with the C scanner behind json.raw_decode.
+        A member cut off by the end of the buffer is retried once the buffer
+        has at least doubled, so even a single huge member costs O(n).
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8')()
+
+    buf = ''
+    pos = 0
+    container = None
+    retry_at = 0
+    done = False
+
+    def value_at(index, final):
+        try:
+            value, end = decoder.raw_decode(buf, index)
+        except ValueError:
+            if final:
+                raise
+            raise _Incomplete()
+        # a number can run on into the next chunk, and raw_decode stops
+        # short of a trailing '.', 'e' or sign it can't parse yet
+        if not final and (end == len(buf) or
+                          (isinstance(value, (int, float)) and not isinstance(value, bool)
+                           and _NUMBER_TAIL.match(buf, end))):
+            raise _Incomplete()
+        return value, end
+
+    def skip(index):
+        return _WHITESPACE.match(buf, index).end()
+
+    chunks = iter(chunks)
+    while not done:
+        chunk = next(chunks, None)
+        final = chunk is None
+        if not final:
+            buf += text.decode(chunk)
+            if len(buf) < retry_at:
+                continue
+
+        while True:
+            pos = skip(pos)
+            if pos >= len(buf):
+                break
+
+            char = buf[pos]
+            if container is None:
+                if char not in '{[':
+                    raise ValueError("Expected a JSON object or array, got %r" % char)
+                container = char
+                pos += 1
+                continue
+
+            if char == ',':
+                pos += 1
+                continue
+
+            if char in '}]':
+                done = True
+                break
+
+            try:
+                if container == '{':
+                    key, end = value_at(pos, final)
+                    end = skip(end)
+                    if end >= len(buf):
+                        raise _Incomplete()
+                    if buf[end] != ':':
+                        raise ValueError("Expected ':' at %d" % end)
+                    value, end = value_at(skip(end + 1), final)
+                else:
+                    key = None
+                    value, end = value_at(pos, final)
+            except _Incomplete:
+                retry_at = 2 * (len(buf) - pos)
+                break
+
+            pos = end
+            retry_at = 0
+            yield key, value
+
+        if final and not done:
+            raise ValueError("Truncated JSON document")
+
+        # drop everything already yielded
+        buf = buf[pos:]
+        pos = 0
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+
+import time
+import heapq
+import logging
+import itertools
+import threading
+
+from pyameritrade.urls import URLs
+
+
+# Lower goes first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10
+
+# Account (and eventually order) calls jump ahead of bulk history backfills
+URL_PRIORITIES = {URLs.TOKEN:               PRIORITY_HIGH,
+                  URLs.GET_ACCOUNT:         PRIORITY_HIGH,
+                  URLs.GET_LINKED_ACCOUNTS: PRIORITY_HIGH,
+                  URLs.PRICE_HISTORY:       PRIORITY_LOW,
+                 }
+
+
+class TokenBucket():
+    """
+        'capacity' tokens, refilled continuously at 'rate' tokens per second.
+        Not thread safe on its own, the RequestScheduler holds the lock.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+    def delay(self):
+        """
+            Seconds until a token is available, 0 if one is available now
+        """
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+
+
+class RequestScheduler():
+    """
+        Client side rate limiter with a priority queue in front of it.
+
+        TD Ameritrade throttles at about 120 requests per minute.  The bucket
+        holds 'burst' requests and refills at (requests_per_minute - burst)
+        per minute, so no 60 second window can ever exceed the limit while
+        sustained throughput stays right under it.  Callers block in
+        acquire() until they are at the head of the queue and a token is
+        available.
+
+        'burst' is clamped to between 1 and requests_per_minute - 1, the
+        bucket needs at least one token and a positive refill rate.
+    """
+    logger = logging.getLogger('pyameritrade.RequestScheduler')
+
+    def __init__(self, requests_per_minute=120, burst=5):
+        clamped = max(1, min(burst, requests_per_minute - 1))
+        if clamped != burst:
+            self.logger.warning("burst %s doesn't fit requests_per_minute %s, using %s" % (burst, requests_per_minute, clamped))
+        self.requests_per_minute = requests_per_minute
+        self.burst = clamped
+        self.bucket = TokenBucket(max(requests_per_minute - clamped, 1) / 60.0, clamped)
+
+        self._heap = list()
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+        # metrics
+        self.requests = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.max_depth = 0
+
+
+    def acquire(self, priority=PRIORITY_NORMAL):
+        """
+            Block until this request may be sent.  Returns the seconds waited.
+        """
+        start = time.monotonic()
+        entry = (priority, next(self._sequence))
+
+        with self._condition:
+            heapq.heappush(self._heap, entry)
+            self.max_depth = max(self.max_depth, len(self._heap))
+            try:
+                while True:
+                    if self._heap[0] == entry:
+                        delay = self.bucket.delay()
+                        if not delay:
+                            self.bucket.take()
+                            break
+                        self._condition.wait(delay)
+                    else:
+                        self._condition.wait()
+            finally:
+                if self._heap[0] == entry:
+                    heapq.heappop(self._heap)
+                else:
+                    self._heap.remove(entry)
+                    heapq.heapify(self._heap)
+                self._condition.notify_all()
+
+            wait = time.monotonic() - start
+            self.requests += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+        if wait > 1:
+            self.logger.debug("Throttled %.2fs at priority %s" % (wait, priority))
+        return wait
+
+
+    @property
+    def depth(self):
+        return len(self._heap)
+
+
+    def stats(self):
+        with self._condition:
+            return {'requests': self.requests,
+                    'queue_depth': len(self._heap),
+                    'max_queue_depth': self.max_depth,
+                    'total_wait': self.total_wait,
+                    'mean_wait': self.total_wait / self.requests if self.requests else 0.0,
+                    'max_wait': self.max_wait,
+                    'tokens': self.bucket.tokens,
+                   }
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+
+import os
+import mmap
+import hashlib
+import logging
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import ujson
+from requests import Response as RawResponse
+from requests.adapters import HTTPAdapter, BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from pyameritrade.exception import ReplayMissError
+
+
+###############################################
+#
+# Record / replay transport adapters, mounted
+# on the Client session under get() and post().
+#
+# An archive is two files:
+#     <path>.dat  response bodies, back to back
+#     <path>.idx  one JSON line per request with the offset
+#                 and length of its body in <path>.dat
+#
+# Token exchanges carry the refresh and access tokens
+# in their bodies and are never recorded.
+#
+###############################################
+
+
+# never written to an archive
+PRIVATE_HEADERS = ('Authorization', 'Cookie', 'Set-Cookie')
+
+# describe the body on the wire, not the decoded body we store
+WIRE_HEADERS = ('Content-Encoding', 'Transfer-Encoding', 'Content-Length')
+
+_write_lock = threading.Lock()
+
+
+def request_key(method, url, body=None):
+    """
+        Stable key for a request: method, url with its query sorted,
+        and body
+    """
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    url = urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))
+
+    digest = hashlib.sha1()
+    digest.update(method.upper().encode('utf-8'))
+    digest.update(b' ')
+    digest.update(url.encode('utf-8'))
+    if body:
+        digest.update(b'\n')
+        digest.update(body if isinstance(body, bytes) else body.encode('utf-8'))
+    return digest.hexdigest()
+
+
+
+class Recorder(HTTPAdapter):
+    """
+        Sends requests for real and appends every response to the archive.
+
+            client = Client(client_id, redirect_url, record='research/quotes')
+
+        Requests to 'private_urls', ie. the token endpoints, are sent but
+        not recorded, so replaying them raises ReplayMissError.
+    """
+    logger = logging.getLogger('pyameritrade.Recorder')
+
+    def __init__(self, path, private_urls=(), **kwargs):
+        self.path = path
+        self.private_urls = frozenset(private_urls)
+        HTTPAdapter.__init__(self, **kwargs)
+
+
+    def send(self, request, **kwargs):
+        response = HTTPAdapter.send(self, request, **kwargs)
+        if request.url.split('?', 1)[0] in self.private_urls:
+            self.logger.debug("Not recording %s %s" % (request.method, request.url))
+        else:
+            self.record(request, response)
+        return response
+
+
+    def record(self, request, response):
+        # reads the whole body, iter_content() still works afterwards
+        body = response.content
+        request_body = request.body
+        if isinstance(request_body, bytes):
+            request_body = request_body.decode('utf-8', 'replace')
+
+        entry = {'key': request_key(request.method, request.url, request.body),
+                 'request': {'method': request.method,
+                             'url': request.url,
+                             'headers': dict((k, v) for k, v in request.headers.items() if k not in PRIVATE_HEADERS),
+                             'body': request_body},
+                 'status': response.status_code,
+                 'reason': response.reason,
+                 'headers': dict((k, v) for k, v in response.headers.items()
+                                 if k not in PRIVATE_HEADERS and k not in WIRE_HEADERS),
+                 'length': len(body)}
+
+        with _write_lock:
+            with open(self.path + '.dat', 'ab') as fo:
+                fo.seek(0, os.SEEK_END)
+                entry['offset'] = fo.tell()
+                fo.write(body)
+            with open(self.path + '.idx', 'a') as fo:
+                fo.write(ujson.dumps(entry) + '\n')
+
+        self.logger.debug("Recorded %s %s" % (request.method, request.url))
+
+
+
+class Replayer(BaseAdapter):
+    """
+        Answers requests from an archive without touching the network.
+
+        The index is loaded into a dict once, so a lookup is a single hash,
+        and bodies are sliced out of a memory mapped data file.  A request
+        recorded more than once replays its latest response.
+
+            client = Client(client_id, redirect_url, replay='research/quotes')
+    """
+    logger = logging.getLogger('pyameritrade.Replayer')
+
+    def __init__(self, path):
+        BaseAdapter.__init__(self)
+        self.path = path
+
+        self.index = dict()
+        with open(path + '.idx', 'r') as fo:
+            for line in fo:
+                if line.strip():
+                    entry = ujson.loads(line)
+                    self.index[entry['key']] = entry
+
+        self._file = open(path + '.dat', 'rb')
+        if os.fstat(self._file.fileno()).st_size:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._data = b''
+
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        entry = self.index.get(request_key(request.method, request.url, request.body))
+        if entry is None:
+            raise ReplayMissError(request.method, request.url)
+
+        response = RawResponse()
+        response.status_code = entry['status']
+        response.reason = entry['reason']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.encoding = None
+        response._content = self._data[entry['offset']:entry['offset'] + entry['length']]
+        response._content_consumed = True
+        return response
+
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
@@ -2,6 +2,7 @@
 
 import re
 from enum import Enum
+from functools import lru_cache
 
 
 class NoValue(Enum):
@@ -25,4 +26,59 @@ class URLs(NoValue):
 
     @classmethod
     def match(klass, URL, url):
-        return re.match(URL.value.replace('%s','.+'), url)
+        return _compile(URL.value).match(url)
+
+
+def pattern(template):
+    """
+        Anchored regex source for a url template, with each '%s'
+        matching one path parameter.
+    """
+    return '.+'.join(re.escape(part) for part in template.split('%s'))
+
+
+@lru_cache(maxsize=None)
+def _compile(template):
+    return re.compile('^%s$' % pattern(template))
+
+
+
+class Router():
+    """
+        Resolves a request url to the key its template was registered under.
+
+        All templates are compiled into one anchored alternation, so a url
+        resolves with a single match and templates that share a prefix,
+        ie. /instruments and /instruments/%s, can't shadow each other.
+    """
+
+    def __init__(self):
+        self._keys = dict()
+        self._groups = list()
+        self._regex = None
+
+
+    def add(self, key, template):
+        group = 'r%d' % len(self._groups)
+        self._keys[group] = key
+        self._groups.append('(?P<%s>%s)' % (group, pattern(template)))
+        self._regex = re.compile('^(?:%s)$' % '|'.join(self._groups))
+
+
+    def resolve(self, url):
+        if self._regex is None:
+            return None
+        match = self._regex.match(url.partition('?')[0])
+        return self._keys[match.lastgroup] if match else None
+
+
+    def __contains__(self, key):
+        return key in self._keys.values()
+
+
+
+# Every TD Ameritrade API endpoint
+ROUTES = Router()
+for URL in URLs:
+    if URL.value.startswith(URLs.ROOT.value + '/'):
+        ROUTES.add(URL, URL.value)
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+
+import time
+import queue
+import asyncio
+import logging
+import threading
+from collections import namedtuple, OrderedDict
+
+import numpy
+
+from pyameritrade.rest_api import unique_symbols
+
+
+# numeric quote fields tracked by default
+WATCH_FIELDS = ('bidPrice', 'bidSize', 'askPrice', 'askSize', 'lastPrice', 'lastSize',
+                'openPrice', 'highPrice', 'lowPrice', 'closePrice', 'netChange', 'mark',
+                'totalVolume', 'quoteTimeInLong', 'tradeTimeInLong')
+
+# 'values' and 'previous' map each changed field to its new and old value,
+# previous is NaN the first time a symbol is seen
+QuoteDelta = namedtuple('QuoteDelta', ('symbol', 'values', 'previous'))
+
+# end of stream() marker
+_END = object()
+
+
+def _number(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return numpy.nan
+
+
+
+class QuoteTable():
+    """
+        Last value of each field per symbol, one row per symbol in a float
+        array that grows as symbols are added.
+    """
+
+    def __init__(self, fields=WATCH_FIELDS, capacity=256):
+        self.fields = tuple(fields)
+        self.rows = dict()
+        self.symbols = list()
+        self.values = numpy.full((capacity, len(self.fields)), numpy.nan)
+
+
+    def __len__(self):
+        return len(self.symbols)
+
+
+    def _row(self, symbol):
+        row = self.rows.get(symbol)
+        if row is None:
+            row = self.rows[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+            if row == len(self.values):
+                grown = numpy.full((2 * len(self.values), len(self.fields)), numpy.nan)
+                grown[:row] = self.values
+                self.values = grown
+        return row
+
+
+    def get(self, symbol):
+        row = self.rows.get(symbol)
+        if row is None:
+            return None
+        return dict(zip(self.fields, self.values[row].tolist()))
+
+
+    def update(self, quotes):
+        """
+            Store the quotes and return a QuoteDelta for each symbol with a
+            changed field.  Fields missing from a quote keep their value.
+        """
+        quotes = list(quotes)
+        if not quotes:
+            return []
+
+        rows = numpy.array([self._row(quote.symbol) for quote in quotes])
+        new = numpy.array([[_number(quote.json.get(field)) for field in self.fields] for quote in quotes],
+                          dtype='float64')
+        old = self.values[rows]
+
+        present = ~numpy.isnan(new)
+        changed = present & ((new != old) | numpy.isnan(old))
+        self.values[rows] = numpy.where(present, new, old)
+
+        deltas = list()
+        fields = self.fields
+        for i in numpy.flatnonzero(changed.any(axis=1)):
+            columns = numpy.flatnonzero(changed[i])
+            deltas.append(QuoteDelta(self.symbols[rows[i]],
+                                     dict((fields[c], new[i, c].item()) for c in columns),
+                                     dict((fields[c], old[i, c].item()) for c in columns)))
+        return deltas
+
+
+
+class Watchlist():
+    def __init__(self, name, symbols, interval):
+        self.name = name
+        self.symbols = unique_symbols(symbols)
+        self.interval = interval
+        self.due = 0.0
+
+
+
+class QuoteWatcher():
+    """
+        Polls any number of watchlists, each on its own interval, and emits
+        only the quote fields that changed.
+
+            watcher = QuoteWatcher(client)
+            watcher.add('positions', held_symbols, interval=1)
+            watcher.add('screen', screen_symbols, interval=15)
+
+            for delta in watcher.deltas():          # blocking generator
+                print(delta.symbol, delta.values)
+
+        Watchlists that are due together are merged into one
+        get_bulk_quotes call, so a symbol on several lists is requested
+        once.  Deltas are also available through a queue.Queue filled by a
+        background thread (start()) or an asyncio queue (stream()).  Both
+        queues are bounded, and polling waits while the consumer catches
+        up rather than piling up deltas.
+    """
+    logger = logging.getLogger('pyameritrade.QuoteWatcher')
+
+    def __init__(self, client, fields=WATCH_FIELDS, clock=time.monotonic):
+        self.client = client
+        self.clock = clock
+        self.table = QuoteTable(fields)
+
+        self.watchlists = OrderedDict()
+        self.polls = 0
+        self.errors = 0
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+
+    def add(self, name, symbols, interval=5.0):
+        with self._lock:
+            self.watchlists[name] = Watchlist(name, symbols, interval)
+
+
+    def remove(self, name):
+        with self._lock:
+            self.watchlists.pop(name, None)
+
+
+    def next_due(self):
+        with self._lock:
+            return min((w.due for w in self.watchlists.values()), default=None)
+
+
+    def poll(self):
+        """
+            Quote every watchlist that is due in one batched request and
+            return the deltas.  Returns [] when nothing is due or the
+            request fails, which is logged and retried on the next interval.
+        """
+        now = self.clock()
+        with self._lock:
+            due = [w for w in self.watchlists.values() if w.due <= now]
+            for w in due:
+                # skip missed intervals rather than bursting to catch up
+                w.due = max(w.due + w.interval, now)
+        if not due:
+            return []
+
+        symbols = unique_symbols(symbol for w in due for symbol in w.symbols)
+        self.polls += 1
+        try:
+            quotes = self.client.get_bulk_quotes(symbols)
+        except Exception:
+            self.errors += 1
+            self.logger.exception("Quote poll for %s failed" % ', '.join(w.name for w in due))
+            return []
+        return self.table.update(quotes.values())
+
+
+    def _delay(self):
+        due = self.next_due()
+        return 1.0 if due is None else max(due - self.clock(), 0.0)
+
+
+    def deltas(self):
+        """
+            Generator of QuoteDeltas until stop().  The next poll only
+            happens once the consumer has taken the previous poll's deltas.
+        """
+        while not self._stop.is_set():
+            if self._stop.wait(self._delay()):
+                break
+            for delta in self.poll():
+                yield delta
+
+
+    def start(self, maxsize=1000):
+        """
+            Poll on a background thread into a queue.Queue(maxsize) and
+            return it.  A full queue blocks the poller.
+        """
+        deltas = queue.Queue(maxsize)
+
+        def produce():
+            for delta in self.deltas():
+                while not self._stop.is_set():
+                    try:
+                        deltas.put(delta, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+
+        self._stop.clear()
+        threading.Thread(target=produce, name='QuoteWatcher', daemon=True).start()
+        return deltas
+
+
+    def stop(self):
+        self._stop.set()
+
+
+    async def produce(self, deltas):
+        """
+            Poll into an asyncio.Queue until stop(), the requests run in the
+            loop's default executor.  Awaits a full queue.
+        """
+        loop = asyncio.get_event_loop()
+        while not self._stop.is_set():
+            await asyncio.sleep(self._delay())
+            for delta in await loop.run_in_executor(None, self.poll):
+                await deltas.put(delta)
+
+
+    async def _produce_and_end(self, deltas):
+        # tell stream() the producer is done, or why it died
+        try:
+            await self.produce(deltas)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await deltas.put(e)
+        else:
+            await deltas.put(_END)
+
+
+    async def stream(self, maxsize=1000):
+        """
+            async for delta in watcher.stream():
+
+            Ends after stop(), and re-raises anything that kills the
+            producer.
+        """
+        deltas = asyncio.Queue(maxsize)
+        self._stop.clear()
+        task = asyncio.ensure_future(self._produce_and_end(deltas))
+        try:
+            while True:
+                delta = await deltas.get()
+                if delta is _END:
+                    return
+                if isinstance(delta, Exception):
+                    raise delta
+                yield delta
+        finally:
+            task.cancel()
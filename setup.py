@@ -9,11 +9,13 @@ setup(name='pyameritrade',
       author_email='sean.dizazzo@gmail.com',
       packages=['pyameritrade'],
       license='MIT',
-      python_requires='>=3.6.0',
+      python_requires='>=3.9.0',
       install_requires=[
             'requests',
+            'urllib3>=1.26',
             'ujson',
-            'pandas',
+            'numpy',
+            'pandas>=2.0',
             'plotly'
             ]
       )
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+import asyncio
+import unittest
+from datetime import datetime, timedelta
+
+from pyameritrade.async_client import AsyncClient
+from pyameritrade.items import Token
+from benchmarks import fixtures
+from benchmarks.mock_server import MockServer
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 30))
+
+
+
+class AsyncClientTest(unittest.TestCase):
+    """
+        AsyncClient against the local stand-in server from benchmarks
+    """
+
+    @classmethod
+    def setUpClass(klass):
+        klass.server = MockServer().start()
+
+
+    @classmethod
+    def tearDownClass(klass):
+        klass.server.stop()
+
+
+    def setUp(self):
+        self.client = AsyncClient(self.server.client(), max_workers=4)
+
+
+    def tearDown(self):
+        self.client.close()
+
+
+    def requests(self, endpoint):
+        return self.client.metrics.endpoints[endpoint].requests
+
+
+    def test_gather(self):
+        quotes, movers = run(self.client.gather(self.client.get_quotes('AAPL,MSFT'),
+                                                self.client.get_movers('$SPX.X')))
+        self.assertEqual([q.symbol for q in quotes], ['AAPL', 'MSFT'])
+        self.assertTrue(len(movers))
+
+
+    def test_map(self):
+        symbols = ['AAPL', 'MSFT', 'SPY']
+        histories = run(self.client.map(self.client.get_price_history, symbols))
+        self.assertEqual([ph.symbol for ph in histories], symbols)
+        self.assertEqual(self.requests('PRICE_HISTORY'), 3)
+
+
+    def test_get_bulk_quotes(self):
+        symbols = ['S%04d' % i for i in range(25)]
+        quotes = run(self.client.get_bulk_quotes(symbols, chunk_size=10))
+        self.assertEqual(list(quotes), symbols)
+        self.assertEqual(self.requests('QUOTES'), 3)
+
+
+    def test_iter_price_histories(self):
+        async def collect():
+            results = dict()
+            async for symbol, ph, error in self.client.iter_price_histories(['AAPL', 'MSFT'],
+                                                                            datetime(2020, 1, 1),
+                                                                            end_date=datetime(2020, 1, 25),
+                                                                            frequency_type='minute',
+                                                                            window=timedelta(days=10)):
+                self.assertIsNone(error)
+                results[symbol] = ph
+            return results
+
+        results = run(collect())
+        self.assertEqual(sorted(results), ['AAPL', 'MSFT'])
+        # three windows per symbol
+        self.assertEqual(self.requests('PRICE_HISTORY'), 6)
+
+
+    def test_refresh_on_401(self):
+        client = self.client.client
+        client.auth_token = Token(fixtures.token(), client)
+        client.session.headers['Authorization'] = 'Bearer expired'
+        self.server.revoked.add('Bearer expired')
+
+        quotes = run(self.client.get_quotes('AAPL'))
+        self.assertEqual(quotes[0].symbol, 'AAPL')
+        self.assertEqual(client.session.headers['Authorization'], 'Bearer mock-access-token')
+        self.assertEqual(self.requests('TOKEN'), 1)
+
+
+    def test_stream_rejected(self):
+        with self.assertRaises(TypeError):
+            run(self.client.get_quotes('AAPL', stream=True))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
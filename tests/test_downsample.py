@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+import unittest
+
+import numpy
+import pandas
+
+from pyameritrade.charts import downsample
+
+
+THRESHOLD = 100
+
+# every length from just under to well over the threshold
+SIZES = list(range(THRESHOLD - 5, 3 * THRESHOLD + 5)) + [1000, 1001, 2001, 9999]
+
+
+def candles(n, seed=0):
+    random = numpy.random.default_rng(seed)
+    close = 100 + numpy.cumsum(random.normal(size=n))
+    index = pandas.date_range('2020-01-01', periods=n, freq='min', tz='UTC', name='datetime')
+    return pandas.DataFrame(dict(open=close + random.normal(size=n),
+                                 high=close + 2,
+                                 low=close - 2,
+                                 close=close,
+                                 volume=random.integers(1, 1000, size=n)),
+                            index=index)
+
+
+
+class DownsampleTest(unittest.TestCase):
+
+    def check_indices(self, keep, n, most):
+        self.assertEqual(keep[0], 0)
+        self.assertEqual(keep[-1], n - 1)
+        self.assertTrue(numpy.all(numpy.diff(keep) > 0))
+        self.assertLessEqual(len(keep), most)
+
+
+    def test_lttb(self):
+        random = numpy.random.default_rng(1)
+        for n in SIZES:
+            keep = downsample.lttb(numpy.arange(n), random.random(n), THRESHOLD)
+            self.check_indices(keep, n, min(n, THRESHOLD))
+            if n > THRESHOLD:
+                self.assertEqual(len(keep), THRESHOLD, n)
+
+
+    def test_minmax(self):
+        random = numpy.random.default_rng(2)
+        for n in SIZES + [9]:
+            threshold = 8 if n == 9 else THRESHOLD
+            y = random.random(n)
+            keep = downsample.minmax(y, threshold)
+            self.check_indices(keep, n, min(n, threshold + 2))
+            # the global extremes are never dropped
+            self.assertIn(numpy.argmin(y), keep)
+            self.assertIn(numpy.argmax(y), keep)
+
+
+    def test_minmax_nan(self):
+        y = numpy.random.default_rng(3).random(2001)
+        y[500:600] = numpy.nan
+        keep = downsample.minmax(y, 2000)
+        self.assertFalse(numpy.isnan(y[keep[1:-1]]).any())
+
+
+    def test_ohlc(self):
+        for n in SIZES:
+            frame = candles(n)
+            bars = downsample.ohlc(frame, THRESHOLD)
+            self.assertLessEqual(len(bars), min(n, THRESHOLD))
+            self.assertEqual(bars['volume'].sum(), frame['volume'].sum())
+            self.assertEqual(bars['high'].max(), frame['high'].max())
+            self.assertEqual(bars['low'].min(), frame['low'].min())
+            self.assertEqual(bars['open'].iloc[0], frame['open'].iloc[0])
+            self.assertEqual(bars['close'].iloc[-1], frame['close'].iloc[-1])
+
+
+    def test_reduce(self):
+        frame = candles(2001)
+        for method in downsample.METHODS:
+            x, y = downsample.reduce(frame.index, frame['close'].values, 2000, method)
+            self.assertLessEqual(len(x), 2002)
+            self.assertEqual(x[0], frame.index[0])
+            self.assertEqual(x[-1], frame.index[-1])
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,18 @@
+#!/usr/bin/env python
+
+import unittest
+
+from benchmarks import bench_import
+
+
+
+class ImportTest(unittest.TestCase):
+
+    def test_client_import_is_light(self):
+        elapsed, heavy = bench_import.probe()
+        self.assertEqual(heavy, [], "'from pyameritrade.client import Client' imported %s" % ', '.join(heavy))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
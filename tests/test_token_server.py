@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+import os
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+import unittest
+
+import ujson
+
+from pyameritrade.client import Client
+from token_server import TokenService, TokenServer
+
+
+@unittest.skipUnless(shutil.which('openssl'), "needs openssl to make a self-signed certificate")
+class TokenServerTest(unittest.TestCase):
+    """
+        A Client authenticating against a local TokenServer over TLS with a
+        freshly made self-signed certificate
+    """
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cert = os.path.join(self.dir, 'certificate.pem')
+        self.key = os.path.join(self.dir, 'key.pem')
+        subprocess.check_call(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                               '-subj', '/CN=127.0.0.1', '-addext', 'subjectAltName=IP:127.0.0.1',
+                               '-keyout', self.key, '-out', self.cert],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        self.expires_at = time.time() + 1800
+        token_file = os.path.join(self.dir, 'token.json')
+        with open(token_file, 'w') as fo:
+            ujson.dump({'access_token': 'served-access-token',
+                        'refresh_token': 'served-refresh-token',
+                        'token_type': 'Bearer',
+                        'expires_in': 1800,
+                        'access_token_expires_at': self.expires_at}, fo)
+
+        service = TokenService('TEST', 'https://127.0.0.1', token_file)
+        self.server = TokenServer(('127.0.0.1', 0), service, certfile=self.cert, keyfile=self.key)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.dir)
+
+
+    def test_authenticate(self):
+        client = Client('TEST', 'https://127.0.0.1:%d' % self.server.server_address[1],
+                        server_cert=self.cert, requests_per_minute=None)
+
+        def grant_refresh_token():
+            raise AssertionError("the served access token should be used as is")
+        client.grant_refresh_token = grant_refresh_token
+
+        try:
+            client.authenticate()
+            self.assertEqual(client.session.headers['Authorization'], 'Bearer served-access-token')
+            self.assertAlmostEqual(client.auth_token.access_token_expires_at, self.expires_at)
+            self.assertGreater(client.token_expires, time.monotonic() + 1700)
+        finally:
+            client.close()
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,27 +1,155 @@
 #!/usr/bin/env/python
 
+"""
+    Central token service.
+
+    Exchanges the browser auth code for an offline token set, persists it to
+    disk, keeps the access token refreshed ahead of expiry and serves it to
+    any number of clients on /auth_token.  Clients see
+    'access_token_expires_at' in the response and use the access token as
+    is, rather than each running their own refresh.
+
+    For local testing with a self-signed certificate:
+
+        openssl req -x509 -newkey rsa:2048 -nodes -days 365 -subj '/CN=127.0.0.1' \
+                    -keyout etc/key.pem -out etc/certificate.pem
+        python token_server.py --port 8443
+
+    and point the client's "server_cert" at etc/certificate.pem.
+"""
+
 import os
+import ssl
+import time
 import logging
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import parse_qs
-import ssl
 
 import ujson
 
 from pyameritrade.client import Client
+from pyameritrade.items import Token
 from pyameritrade.urls import URLs
 
-CLIENT_ID = "**********@AMER.OAUTHAP"
+# without the @AMER.OAUTHAP suffix, Client adds it
+CLIENT_ID = "**********"
+OAUTH_SUFFIX = "@AMER.OAUTHAP"
 REDIRECT_URL = "https://127.0.0.1"
 
-AUTH_TOKEN = None
-
 etc_dir = os.path.join(os.path.dirname(__file__), 'etc')
 
-logging.basicConfig(level=logging.DEBUG,
-                    handlers=[logging.FileHandler("token_server.log")],
-                    format='%(asctime)s %(message)s',
-                    )
+
+
+class TokenService():
+    """
+        Owns the token set.  All access goes through the lock, refreshes
+        are single flight and every change is written to disk before it is
+        served.
+    """
+
+    def __init__(self, client_id, redirect_url, path, margin=300):
+        if client_id.endswith(OAUTH_SUFFIX):
+            client_id = client_id[:-len(OAUTH_SUFFIX)]
+        self.client_id = client_id
+        self.redirect_url = redirect_url
+        self.path = path
+        self.margin = margin
+
+        self.token = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+        self.load()
+
+
+    def _client(self, access_code=None):
+        # the service does its own refreshing, the client must not
+        return Client(self.client_id, self.redirect_url, access_code=access_code,
+                      auto_refresh=False, requests_per_minute=None)
+
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r') as fo:
+            self.token = ujson.load(fo)
+        logging.info("Loaded token set from %s" % self.path)
+
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as fo:
+            ujson.dump(self.token, fo)
+        os.replace(tmp, self.path)
+
+
+    def _stamp(self, token_json):
+        # absolute expiry times, so they survive a restart
+        now = time.time()
+        token_json['access_token_expires_at'] = now + token_json['expires_in']
+        if 'refresh_token_expires_in' in token_json:
+            token_json['refresh_token_expires_at'] = now + token_json['refresh_token_expires_in']
+        return token_json
+
+
+    def authorize(self, code):
+        token = self._client(access_code=code).grant_offline_token()
+        with self._lock:
+            self.token = self._stamp(dict(token.json))
+            self.save()
+        self._wakeup.set()
+
+
+    def refresh(self, force=False):
+        with self._lock:
+            if not self.token:
+                return None
+            if not force and self.token['access_token_expires_at'] - time.time() > self.margin:
+                return self.token
+
+            client = self._client()
+            client.auth_token = Token(self.token, client)
+            refreshed = client.grant_refresh_token().json
+
+            # a refresh grant only returns a new access token
+            token = dict(self.token)
+            token.update(self._stamp(dict(refreshed)))
+            if 'refresh_token' not in refreshed:
+                token['refresh_token_expires_at'] = self.token.get('refresh_token_expires_at')
+            self.token = token
+            self.save()
+            logging.info("Refreshed access token")
+            return self.token
+
+
+    def current(self):
+        """
+            The token set, refreshed first if the background
+            refresher has fallen behind.
+        """
+        token = self.token
+        if token and token['access_token_expires_at'] - time.time() <= self.margin:
+            token = self.refresh()
+        return token
+
+
+    def run_refresher(self):
+        while True:
+            delay = 60
+            if self.token:
+                try:
+                    self.refresh()
+                    delay = max(self.token['access_token_expires_at'] - time.time() - self.margin, 1)
+                except Exception:
+                    logging.exception("Token refresh failed, retrying in 30s")
+                    delay = 30
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+
+
 
 class Handler(BaseHTTPRequestHandler):
 
@@ -34,38 +162,97 @@ class Handler(BaseHTTPRequestHandler):
     def do_GET(self):
         logging.info("GET %s" % self.path)
 
-        global AUTH_TOKEN
+        service = self.server.service
 
         path, _, query_string = self.path.partition('?')
 
         if path == '/':
-            code = parse_qs(query_string)['code']
-            am_client = Client(CLIENT_ID, REDIRECT_URL, access_code=code)
-            AUTH_TOKEN = am_client.grant_offline_token().json
+            code = parse_qs(query_string)['code'][0]
+            service.authorize(code)
 
             self._set_headers()
             self.wfile.write('{"message": "auth token set"}'.encode('utf-8'))
 
         elif path == URLs.AUTH_TOKEN.value:
-            logging.info("AUTH TOKEN: '%s'" % AUTH_TOKEN)
-            if not AUTH_TOKEN:
+            token = service.current()
+            if not token:
                 self.send_error(409, message='{"status":"auth code is not set"}',
                                      explain='Server auth code is not set. Authorize in web browser before continuing.')
                 return
 
             self._set_headers()
-            self.wfile.write(ujson.dumps(AUTH_TOKEN).encode('utf-8'))
+            self.wfile.write(ujson.dumps(token).encode('utf-8'))
 
         else:
             self.error_content_type = 'application/json'
             self.send_error(404)
 
+
+    def log_message(self, format, *args):
+        logging.info(format % args)
+
+
+
+class TokenServer(ThreadingHTTPServer):
+    """
+        Each connection is TLS wrapped as it is accepted, but the handshake
+        runs on its handler thread, so a slow or stalled client can't hold
+        up accept() for everyone else.
+    """
+    daemon_threads = True
+    handshake_timeout = 10
+
+    def __init__(self, address, service, certfile=None, keyfile=None):
+        ThreadingHTTPServer.__init__(self, address, Handler)
+        self.service = service
+
+        self.context = None
+        if certfile:
+            self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            self.context.load_cert_chain(certfile=certfile, keyfile=keyfile)
+
+
+    def get_request(self):
+        sock, address = self.socket.accept()
+        if self.context:
+            sock = self.context.wrap_socket(sock, server_side=True, do_handshake_on_connect=False)
+        return sock, address
+
+
+    def finish_request(self, request, client_address):
+        if self.context:
+            request.settimeout(self.handshake_timeout)
+            try:
+                request.do_handshake()
+            except (ssl.SSLError, OSError) as e:
+                logging.info("TLS handshake with %s failed: %s" % (client_address[0], e))
+                return
+            request.settimeout(None)
+        ThreadingHTTPServer.finish_request(self, request, client_address)
+
+
+
 if __name__ == "__main__":
-    logging.info("Listening on 0.0.0.0:443")
-    httpd = HTTPServer(('0.0.0.0', 443), Handler)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=443)
+    parser.add_argument('--client-id', default=CLIENT_ID)
+    parser.add_argument('--redirect-url', default=REDIRECT_URL)
+    parser.add_argument('--certfile', default=os.path.join(etc_dir, 'certificate.pem'))
+    parser.add_argument('--keyfile', default=os.path.join(etc_dir, 'key.pem'))
+    parser.add_argument('--token-file', default=os.path.join(etc_dir, 'token.json'))
+    parser.add_argument('--margin', type=int, default=300,
+                        help='refresh the access token this many seconds before it expires')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG,
+                        handlers=[logging.FileHandler("token_server.log")],
+                        format='%(asctime)s %(message)s',
+                        )
 
-    httpd.socket = ssl.wrap_socket (httpd.socket,
-            keyfile=os.path.join(etc_dir, 'key.pem'),
-            certfile=os.path.join(etc_dir, 'certificate.pem'), server_side=True)
+    service = TokenService(args.client_id, args.redirect_url, args.token_file, margin=args.margin)
+    threading.Thread(target=service.run_refresher, name='refresher', daemon=True).start()
 
+    logging.info("Listening on %s:%s" % (args.host, args.port))
+    httpd = TokenServer((args.host, args.port), service, certfile=args.certfile, keyfile=args.keyfile)
     httpd.serve_forever()